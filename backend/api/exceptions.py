@@ -0,0 +1,10 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ServiceUnavailable(APIException):
+    """Временная недоступность сервиса, клиент может повторить запрос."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис временно недоступен, повторите запрос позже.'
+    default_code = 'service_unavailable'
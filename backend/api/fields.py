@@ -0,0 +1,32 @@
+from django.core.files.storage import default_storage
+
+from rest_framework import serializers
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии фотографии рецепта.
+
+    Пока копии текущей фотографии не построены, возвращается пустой словарь.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        variants = recipe.image_variants
+        if not recipe.image or variants.get('source') != recipe.image.name:
+            return {}
+        request = self.context.get('request')
+        return {
+            name: {
+                image_format: (
+                    request.build_absolute_uri(default_storage.url(path))
+                    if request
+                    else default_storage.url(path)
+                )
+                for image_format, path in paths.items()
+            }
+            for name, paths in variants.items()
+            if name != 'source'
+        }
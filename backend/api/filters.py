@@ -1,48 +1,101 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef
+
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
-from users.models import User
+from api.indexes import get_tag_registry
+from foodgram_backend import settings
+from recipes.models import Favorites, Recipe, ShoppingList
+from recipes.search import get_search_engine
 
 
-class IngredientsFilter(FilterSet):
-    """Фильтрация ингредиентов."""
+class MultipleIdField(forms.Field):
+    """Поле для повторяющегося параметра с целыми id."""
 
-    name = filters.CharFilter(
-        field_name='name', lookup_expr='istartswith'
-    )
+    widget = forms.SelectMultiple
+    default_error_messages = {'invalid': 'Передайте id целыми числами.'}
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return [int(item) for item in value]
+        except (TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid'], 'invalid')
+
+
+class MultipleIdFilter(filters.Filter):
+    """Фильтр по списку id без проверки их наличия в БД."""
+
+    field_class = MultipleIdField
+
+
+def tag_choices():
+    return get_tag_registry().choices()
 
 
 class RecipeFilter(FilterSet):
-    """Фильтрация рецептов."""
+    """Фильтрация рецептов.
 
-    author = filters.ModelMultipleChoiceFilter(
-        queryset=User.objects.all(),
-        field_name='author__username',
-    )
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    Условия по связанным таблицам не присоединяются к запросу, поэтому
+    он остается выборкой из одной таблицы рецептов без дублей строк и
+    DISTINCT. Теги проверяются коррелированным EXISTS, под который
+    подходит большая часть ленты, а избранное и список покупок - через
+    id IN по небольшому набору рецептов пользователя.
+    """
+
+    author = MultipleIdFilter(field_name='author_id', lookup_expr='in')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices, method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(method='check_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='check_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='search_recipes')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in settings.RECIPE_ORDERINGS],
+        method='order_recipes',
+    )
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
 
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag_id__in=get_tag_registry().ids(value),
+                )
+            )
+        )
+
+    def filter_user_recipes(self, queryset, model):
+        return queryset.filter(
+            pk__in=model.objects.filter(user=self.request.user).values(
+                'recipe_id'
+            )
+        )
+
     def check_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorites__user=self.request.user)
+            return self.filter_user_recipes(queryset, Favorites)
         return queryset
 
     def check_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shoppinglists__user=self.request.user)
+            return self.filter_user_recipes(queryset, ShoppingList)
         return queryset
+
+    def search_recipes(self, queryset, name, value):
+        return (
+            get_search_engine()
+            .search(queryset, value)
+            .order_by(*settings.RECIPE_SEARCH_ORDERING)
+        )
+
+    def order_recipes(self, queryset, name, value):
+        return queryset.order_by(*settings.RECIPE_ORDERINGS[value])
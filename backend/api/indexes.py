@@ -0,0 +1,279 @@
+import bisect
+import logging
+import threading
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+from django.db import connection
+
+from recipes.metrics import cache_lookup
+from recipes.models import Ingredient, ProductsInRecipe, Recipe, Tag
+from recipes.versions import get_version
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(value):
+    """Приведение строки к виду для поиска без учета регистра и ё."""
+    return (
+        unicodedata.normalize('NFC', value)
+        .casefold()
+        .replace('ё', 'е')
+        .strip()
+    )
+
+
+class IngredientIndex:
+    """Неизменяемый префиксный индекс ингредиентов для автодополнения."""
+
+    def __init__(self, ingredients, version=None):
+        self.version = version
+        entries = sorted(
+            (normalize(name), ingredient_id, name, measurement_unit)
+            for ingredient_id, name, measurement_unit in ingredients
+        )
+        self._keys = tuple(entry[0] for entry in entries)
+        self._items = tuple(
+            {
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            }
+            for _, ingredient_id, name, measurement_unit in entries
+        )
+        self._by_id = tuple(
+            sorted(self._items, key=lambda item: item['id'])
+        )
+
+    def __len__(self):
+        return len(self._items)
+
+    def all(self):
+        """Все ингредиенты в порядке id."""
+        return list(self._by_id)
+
+    def search(self, query):
+        """Поиск: полное совпадение, затем префикс, затем вхождение."""
+        query = normalize(query)
+        if not query:
+            return self.all()
+        start = bisect.bisect_left(self._keys, query)
+        end = bisect.bisect_right(self._keys, query + chr(0x10FFFF))
+        contains = [
+            self._items[position]
+            for position, key in enumerate(self._keys)
+            if query in key and not start <= position < end
+        ]
+        # Полные совпадения в отсортированном индексе идут перед префиксными.
+        return [*self._items[start:end], *contains]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_ingredient_index(version=None):
+    """Индекс ингредиентов текущего процесса, пересобираемый по версии.
+
+    Версию можно передать, если она уже прочитана для ответа.
+    """
+    global _index
+    if version is None:
+        version = get_version('ingredients')
+    index = _index
+    hit = index is not None and index.version == version
+    if not hit:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = IngredientIndex(
+                    Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit'
+                    ),
+                    version,
+                )
+            index = _index
+    cache_lookup('ingredient_index', hit)
+    return index
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс ингредиент -> рецепты для поиска по продуктам.
+
+    Рецепты пронумерованы в порядке ленты (-pub_date, -id), для каждого
+    ингредиента хранится отсортированный массив номеров рецептов, для
+    каждого тега - множество номеров. Совпадения считаются Counter.update
+    по массивам, то есть в C, без запросов к БД.
+    """
+
+    def __init__(self, recipes, products, tags, version=None):
+        self.version = version
+        self._recipe_ids = array('I', recipes)
+        positions = {
+            recipe_id: position
+            for position, recipe_id in enumerate(self._recipe_ids)
+        }
+        # Рецепты, созданные между запросами построения, пропускаются до
+        # следующей версии индекса.
+        postings = defaultdict(list)
+        for recipe_id, ingredient_id in products:
+            if recipe_id in positions:
+                postings[ingredient_id].append(positions[recipe_id])
+        self._postings = {
+            ingredient_id: array('I', sorted(set(recipe_positions)))
+            for ingredient_id, recipe_positions in postings.items()
+        }
+        totals = Counter()
+        for recipe_positions in self._postings.values():
+            totals.update(recipe_positions)
+        self._totals = array(
+            'H', (totals[position] for position in range(len(positions)))
+        )
+        by_tag = defaultdict(set)
+        for recipe_id, slug in tags:
+            if recipe_id in positions:
+                by_tag[slug].add(positions[recipe_id])
+        self._tags = {
+            slug: frozenset(recipe_positions)
+            for slug, recipe_positions in by_tag.items()
+        }
+
+    def __len__(self):
+        return len(self._recipe_ids)
+
+    def rank(self, ingredient_ids, tags=()):
+        """Рецепты, в которых есть хотя бы один продукт из ingredient_ids.
+
+        Возвращает список (id рецепта, не хватает ингредиентов, всего
+        ингредиентов): сначала рецепты, для которых есть все, затем по
+        доле недостающих, при равенстве - более новые.
+        """
+        covered = Counter()
+        for ingredient_id in set(ingredient_ids):
+            covered.update(self._postings.get(ingredient_id, ()))
+        if tags:
+            allowed = frozenset().union(
+                *(self._tags.get(slug, ()) for slug in tags)
+            )
+            covered = {
+                position: count
+                for position, count in covered.items()
+                if position in allowed
+            }
+        totals = self._totals
+        ranked = sorted(
+            covered.items(),
+            key=lambda item: (
+                (totals[item[0]] - item[1]) / totals[item[0]],
+                item[0],
+            ),
+        )
+        return [
+            (
+                self._recipe_ids[position],
+                totals[position] - count,
+                totals[position],
+            )
+            for position, count in ranked
+        ]
+
+
+_recipe_index = None
+_recipe_rebuild = None
+_recipe_lock = threading.Lock()
+
+
+def build_recipe_ingredient_index(version):
+    return RecipeIngredientIndex(
+        Recipe.objects.order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        ),
+        ProductsInRecipe.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        ),
+        Recipe.tags.through.objects.values_list('recipe_id', 'tag__slug'),
+        version,
+    )
+
+
+def rebuild_recipe_ingredient_index(version):
+    """Пересборка обратного индекса в фоновом потоке."""
+    global _recipe_index, _recipe_rebuild
+    try:
+        index = build_recipe_ingredient_index(version)
+        with _recipe_lock:
+            _recipe_index = index
+    except Exception:
+        logger.exception('recipe ingredient index rebuild failed')
+    finally:
+        with _recipe_lock:
+            _recipe_rebuild = None
+        connection.close()
+
+
+def get_recipe_ingredient_index():
+    """Обратный индекс рецептов текущего процесса, пересобираемый по версии.
+
+    Первый индекс строится в запросе, а после изменения рецептов новый
+    строится в фоновом потоке: до его готовности запросы получают
+    прежний индекс, а удаленные с тех пор рецепты отсеивает вьюсет.
+    """
+    global _recipe_index, _recipe_rebuild
+    version = get_version('pantry')
+    index = _recipe_index
+    hit = index is not None and index.version == version
+    if not hit:
+        with _recipe_lock:
+            if _recipe_index is None:
+                _recipe_index = build_recipe_ingredient_index(version)
+            elif _recipe_index.version != version and _recipe_rebuild is None:
+                _recipe_rebuild = threading.Thread(
+                    target=rebuild_recipe_ingredient_index,
+                    args=(version,),
+                    name='recipe-ingredient-index',
+                    daemon=True,
+                )
+                _recipe_rebuild.start()
+            index = _recipe_index
+    cache_lookup('recipe_ingredient_index', hit)
+    return index
+
+
+class TagRegistry:
+    """Соответствие slug -> id тегов для проверки параметров без запросов."""
+
+    def __init__(self, tags, version=None):
+        self.version = version
+        self._ids = dict(tags)
+
+    def __contains__(self, slug):
+        return slug in self._ids
+
+    def choices(self):
+        """Варианты для ChoiceField в порядке slug."""
+        return [(slug, slug) for slug in sorted(self._ids)]
+
+    def ids(self, slugs):
+        """id тегов по списку slug, неизвестные slug пропускаются."""
+        return [self._ids[slug] for slug in slugs if slug in self._ids]
+
+
+_tag_registry = None
+_tag_lock = threading.Lock()
+
+
+def get_tag_registry():
+    """Реестр тегов текущего процесса, пересобираемый по версии."""
+    global _tag_registry
+    version = get_version('tags')
+    registry = _tag_registry
+    hit = registry is not None and registry.version == version
+    if not hit:
+        with _tag_lock:
+            if _tag_registry is None or _tag_registry.version != version:
+                _tag_registry = TagRegistry(
+                    Tag.objects.values_list('slug', 'id'), version
+                )
+            registry = _tag_registry
+    cache_lookup('tag_registry', hit)
+    return registry
@@ -0,0 +1,408 @@
+import base64
+import io
+import json
+import platform
+import statistics
+import tempfile
+import time
+
+import django
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.management.commands.benchmark_ingredient_search import percentile
+from api.utils import QueryCounter
+from recipes.management.commands.generate_data import PASSWORD
+from recipes.models import (
+    Favorites,
+    Ingredient,
+    ProductsInRecipe,
+    Recipe,
+    ShoppingList,
+    Subscription,
+    Tag,
+)
+from users.models import User
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-endpoints',
+    }
+}
+
+
+def png_bytes():
+    """Маленькая PNG картинка для загрузки фотографий."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (200, 120, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    """Замеры всех маршрутов API на синтетическом наборе данных.
+
+    Набор данных создается в отдельной тестовой БД, каждый запрос
+    выполняется в транзакции, которая затем откатывается, поэтому
+    изменяющие запросы не влияют на следующие замеры. Для каждого
+    маршрута записываются время ответа, количество и время SQL запросов,
+    результаты сравниваются с сохраненными ранее.
+    """
+
+    help = 'benchmark every API route and compare with a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=float, default=8)
+        parser.add_argument('--favorites', type=int, default=2000)
+        parser.add_argument('--cart-entries', type=int, default=2000)
+        parser.add_argument('--subscriptions', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--routes',
+            nargs='*',
+            default=[],
+            help='measure only routes with these names',
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark_endpoints.json',
+            help='file for the JSON results',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON results of a previous run to compare with',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='write the results to --baseline instead of comparing',
+        )
+        parser.add_argument(
+            '--time-tolerance',
+            type=float,
+            default=0.5,
+            help='allowed relative growth of the median response time',
+        )
+        parser.add_argument(
+            '--min-delta-ms',
+            type=float,
+            default=2.0,
+            help='ignore time growth smaller than this',
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='keep the test database between runs',
+        )
+
+    def dataset(self, options):
+        return {
+            name: options[name]
+            for name in (
+                'users',
+                'recipes',
+                'ingredients_per_recipe',
+                'favorites',
+                'cart_entries',
+                'subscriptions',
+                'seed',
+            )
+        }
+
+    def seed(self, dataset):
+        """Пользователи, рецепты, избранное, покупки и подписки."""
+        call_command('generate_data', **dataset, stdout=io.StringIO())
+
+    def get_routes(self):
+        """Маршруты API: имя, метод, путь, данные, нужна ли авторизация."""
+        user = User.objects.order_by('pk').first()
+        author = (
+            Subscription.objects.filter(user=user).values('author_id').first()
+        )['author_id']
+        other = User.objects.exclude(pk=user.pk).exclude(
+            pk__in=Subscription.objects.filter(user=user).values('author_id')
+        ).first()
+        recipe = Recipe.objects.filter(author=user).first() or (
+            Recipe.objects.first()
+        )
+        favorite = Favorites.objects.filter(user=user).first().recipe_id
+        in_cart = ShoppingList.objects.filter(user=user).first().recipe_id
+        fresh = (
+            Recipe.objects.exclude(favorites__user=user)
+            .exclude(shoppinglists__user=user)
+            .first()
+            .pk
+        )
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        ingredients = list(
+            ProductsInRecipe.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', flat=True
+            )
+        )
+        ingredient = Ingredient.objects.get(pk=ingredients[0])
+        image = 'data:image/png;base64,' + base64.b64encode(
+            png_bytes()
+        ).decode()
+        recipe_data = {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredients
+            ],
+            'tags': list(Tag.objects.values_list('pk', flat=True)[:2]),
+            'image': image,
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+        }
+        recipes = '/api/recipes/'
+        return user, [
+            ('tags-list', 'get', '/api/tags/', None, False),
+            ('ingredients-search', 'get', '/api/ingredients/',
+             {'name': ingredient.name[:3]}, False),
+            ('ingredients-detail', 'get',
+             f'/api/ingredients/{ingredient.pk}/', None, False),
+            ('users-list', 'get', '/api/users/', None, False),
+            ('users-detail', 'get', f'/api/users/{author}/', None, True),
+            ('users-me', 'get', '/api/users/me/', None, True),
+            ('users-create', 'post', '/api/users/', {
+                'email': 'new-user@example.org',
+                'username': 'new-user',
+                'first_name': 'Новый',
+                'last_name': 'Пользователь',
+                'password': PASSWORD,
+            }, False),
+            ('auth-login', 'post', '/api/auth/token/login/',
+             {'email': user.email, 'password': PASSWORD}, False),
+            ('users-subscriptions', 'get', '/api/users/subscriptions/',
+             {'recipes_limit': 3}, True),
+            ('users-subscribe', 'post',
+             f'/api/users/{other.pk}/subscribe/', None, True),
+            ('users-unsubscribe', 'delete',
+             f'/api/users/{author}/subscribe/', None, True),
+            ('recipes-list-anonymous', 'get', recipes, None, False),
+            ('recipes-list', 'get', recipes, None, True),
+            ('recipes-list-tags', 'get', recipes, {'tags': tags}, True),
+            ('recipes-list-author', 'get', recipes, {'author': author}, True),
+            ('recipes-list-favorited', 'get', recipes,
+             {'is_favorited': 1}, True),
+            ('recipes-list-in-cart', 'get', recipes,
+             {'is_in_shopping_cart': 1}, True),
+            ('recipes-list-search', 'get', recipes,
+             {'search': 'суп курица'}, True),
+            ('recipes-list-popular', 'get', recipes,
+             {'ordering': 'popular'}, True),
+            ('recipes-list-trending', 'get', recipes,
+             {'ordering': 'trending'}, True),
+            ('recipes-list-combined', 'get', recipes, {
+                'tags': tags[:1],
+                'is_favorited': 1,
+                'is_in_shopping_cart': 1,
+            }, True),
+            ('recipes-detail', 'get', f'{recipes}{recipe.pk}/', None, True),
+            ('recipes-create', 'post', recipes, recipe_data, True),
+            ('recipes-update', 'patch', f'{recipes}{recipe.pk}/',
+             recipe_data, True),
+            ('recipes-delete', 'delete', f'{recipes}{recipe.pk}/', None, True),
+            ('recipes-upload-image', 'post', f'{recipes}images/',
+             lambda: {'image': SimpleUploadedFile(
+                 'image.png', png_bytes(), 'image/png'
+             )}, True),
+            ('recipes-pantry', 'get', f'{recipes}pantry/',
+             {'ingredients': ingredients[:3]}, False),
+            ('favorite-add', 'post', f'{recipes}{fresh}/favorite/',
+             None, True),
+            ('favorite-remove', 'delete', f'{recipes}{favorite}/favorite/',
+             None, True),
+            ('favorite-batch', 'post', f'{recipes}favorite/batch/',
+             {'add': [fresh], 'remove': [favorite]}, True),
+            ('shopping-cart-add', 'post',
+             f'{recipes}{fresh}/shopping_cart/', None, True),
+            ('shopping-cart-remove', 'delete',
+             f'{recipes}{in_cart}/shopping_cart/', None, True),
+            ('shopping-cart-batch', 'post', f'{recipes}shopping_cart/batch/',
+             {'add': [fresh], 'remove': [in_cart]}, True),
+            ('shopping-cart-from-favorites', 'post',
+             f'{recipes}shopping_cart/from_favorites/', None, True),
+            ('shopping-cart-clear', 'delete', f'{recipes}shopping_cart/',
+             None, True),
+            ('shopping-cart-totals', 'get',
+             f'{recipes}shopping_cart_totals/', None, True),
+            *(
+                (f'download-shopping-cart-{file_format}', 'get',
+                 f'{recipes}download_shopping_cart/',
+                 {'format': file_format}, True)
+                for file_format in ('xlsx', 'csv', 'txt')
+            ),
+        ]
+
+    def request(self, client, method, path, data):
+        """Запрос с чтением всего тела ответа, в том числе потокового."""
+        if method == 'get':
+            response = client.get(path, data)
+        elif callable(data):
+            response = getattr(client, method)(path, data())
+        else:
+            response = getattr(client, method)(path, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        else:
+            response.content
+        return response
+
+    def measure(self, client, method, path, data, repeat):
+        """Медианы и p95 по повторам, каждый повтор откатывается."""
+        wall, sql, queries, status = [], [], 0, None
+        for attempt in range(repeat + 1):
+            cache.clear()
+            counter = QueryCounter()
+            with transaction.atomic():
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    response = self.request(client, method, path, data)
+                    elapsed = (time.perf_counter() - started) * 1000
+                transaction.set_rollback(True)
+            if not attempt:
+                continue
+            status = response.status_code
+            queries = counter.count
+            wall.append(elapsed)
+            sql.append(counter.duration * 1000)
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': status,
+            'queries': queries,
+            'wall_ms': round(statistics.median(wall), 3),
+            'wall_p95_ms': round(percentile(wall, 95), 3),
+            'sql_ms': round(statistics.median(sql), 3),
+        }
+
+    def run(self, options):
+        dataset = self.dataset(options)
+        started = time.perf_counter()
+        self.seed(dataset)
+        self.stdout.write(
+            f'seeded {Recipe.objects.count()} recipes, '
+            f'{User.objects.count()} users in '
+            f'{time.perf_counter() - started:.1f} s'
+        )
+        user, routes = self.get_routes()
+        token, _ = Token.objects.get_or_create(user=user)
+        anonymous = APIClient()
+        authorized = APIClient()
+        authorized.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        results = {}
+        for name, method, path, data, auth in routes:
+            if options['routes'] and name not in options['routes']:
+                continue
+            results[name] = self.measure(
+                authorized if auth else anonymous,
+                method,
+                path,
+                data,
+                options['repeat'],
+            )
+            self.stdout.write(
+                f'{name}: {results[name]["status"]}, '
+                f'{results[name]["queries"]} queries, '
+                f'wall {results[name]["wall_ms"]:.1f} ms, '
+                f'sql {results[name]["sql_ms"]:.1f} ms'
+            )
+        return {
+            'dataset': dataset,
+            'environment': {
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'routes': results,
+        }
+
+    def compare(self, results, baseline, options):
+        """Список регрессий относительно сохраненных результатов."""
+        if baseline['dataset'] != results['dataset']:
+            raise CommandError(
+                'baseline was recorded on a different dataset: '
+                f'{baseline["dataset"]}'
+            )
+        regressions = []
+        for name, current in results['routes'].items():
+            previous = baseline['routes'].get(name)
+            if previous is None:
+                continue
+            if current['status'] != previous['status']:
+                regressions.append(
+                    f'{name}: status {previous["status"]} -> '
+                    f'{current["status"]}'
+                )
+            if current['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: queries {previous["queries"]} -> '
+                    f'{current["queries"]}'
+                )
+            delta = current['wall_ms'] - previous['wall_ms']
+            if (
+                delta > options['min_delta_ms']
+                and delta > previous['wall_ms'] * options['time_tolerance']
+            ):
+                regressions.append(
+                    f'{name}: wall {previous["wall_ms"]:.1f} ms -> '
+                    f'{current["wall_ms"]:.1f} ms'
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline requires --baseline')
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                # Замеры сбрасывают кеш, поэтому он заменяется собственным,
+                # чтобы не очистить общий кеш работающего сайта.
+                with override_settings(
+                    MEDIA_ROOT=media_root, CACHES=BENCHMARK_CACHES
+                ):
+                    with transaction.atomic():
+                        results = self.run(options)
+                        transaction.set_rollback(True)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+        with open(options['output'], 'w', encoding='UTF-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'results written to {options["output"]}')
+        if not options['baseline']:
+            return
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='UTF-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'baseline written to {options["baseline"]}')
+            return
+        with open(options['baseline'], encoding='UTF-8') as file:
+            baseline = json.load(file)
+        regressions = self.compare(results, baseline, options)
+        if regressions:
+            raise CommandError(
+                'performance regressions:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('no regressions'))
@@ -0,0 +1,56 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.indexes import get_ingredient_index
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+
+def percentile(values, percent):
+    """Перцентиль по отсортированному списку значений."""
+    values = sorted(values)
+    position = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[position]
+
+
+class Command(BaseCommand):
+    """Сравнение задержек поиска ингредиентов через ORM и индекс."""
+
+    help = 'benchmark ingredient autocomplete: ORM vs in-process index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stdout.write(self.style.ERROR('no ingredients loaded'))
+            return
+        generator = random.Random(options['seed'])
+        queries = [
+            name[: generator.randint(1, 5)]
+            for name in generator.choices(names, k=options['queries'])
+        ]
+        index = get_ingredient_index()
+        paths = {
+            'orm': lambda query: IngredientSerializer(
+                Ingredient.objects.filter(name__istartswith=query),
+                many=True,
+            ).data,
+            'index': index.search,
+        }
+        for path, search in paths.items():
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                search(query)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'{path}: mean {statistics.mean(timings):.3f} ms, '
+                f'p50 {percentile(timings, 50):.3f} ms, '
+                f'p99 {percentile(timings, 99):.3f} ms'
+            )
@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import RecipeFeedPagination
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Сравнение задержек первой и глубокой страницы ленты рецептов."""
+
+    help = 'benchmark recipe feed: page number vs cursor pagination'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--pages', type=int, nargs='*', default=[1, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def measure(self, query):
+        request = Request(APIRequestFactory().get('/api/recipes/', query))
+        request.user = AnonymousUser()
+        queryset = Recipe.objects.with_related().with_user_flags(
+            request.user
+        )
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            paginator = RecipeFeedPagination()
+            list(paginator.paginate_queryset(queryset, request))
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        limit = options['limit']
+        total = Recipe.objects.count()
+        paginator = RecipeFeedPagination()
+        for page in options['pages']:
+            offset = (page - 1) * limit
+            if offset >= total:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'page {page}: only {total} recipes, skipped'
+                    )
+                )
+                continue
+            query = {'limit': limit}
+            if page > 1:
+                previous = Recipe.objects.order_by('-pub_date', '-id')[
+                    offset - 1
+                ]
+                query['cursor'] = paginator.encode_cursor('next', previous)
+            else:
+                query['cursor'] = ''
+            offset_ms = self.measure({'limit': limit, 'page': page})
+            cursor_ms = self.measure(query)
+            self.stdout.write(
+                f'page {page}: page number {offset_ms:.2f} ms, '
+                f'cursor {cursor_ms:.2f} ms'
+            )
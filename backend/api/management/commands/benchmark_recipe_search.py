@@ -0,0 +1,111 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+
+from api.management.commands.benchmark_ingredient_search import percentile
+from foodgram_backend import settings
+from recipes.management.commands.generate_data import (
+    ADJECTIVES,
+    DISHES,
+    WORDS,
+)
+from recipes.models import Recipe
+from recipes.search import get_search_engine
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Задержки полнотекстового поиска рецептов на синтетических данных."""
+
+    help = 'benchmark recipe full-text search against an icontains scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100_000,
+            help='create synthetic recipes until there are this many',
+        )
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def seed(self, count, generator):
+        """Рецепты со случайными названиями и описаниями из словаря."""
+        author, _ = User.objects.get_or_create(
+            username='search-benchmark',
+            defaults={'email': 'search-benchmark@example.org'},
+        )
+        last_recipe = Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=author,
+                    name=(
+                        f'{generator.choice(DISHES).capitalize()} '
+                        f'{generator.choice(ADJECTIVES)} '
+                        f'№{last_recipe + number}'
+                    ),
+                    image='recipes/images/placeholder.png',
+                    text=' '.join(
+                        generator.choices(WORDS, k=generator.randint(20, 60))
+                    ),
+                    cooking_time=generator.randint(1, 120),
+                )
+                for number in range(1, count + 1)
+            ),
+            batch_size=1000,
+        )
+
+    def make_query(self, generator):
+        words = generator.sample(DISHES + ADJECTIVES + WORDS, 2)
+        if generator.random() < 0.5:
+            return words[0]
+        return ' '.join(words)
+
+    def measure(self, search, queries):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            list(search(query))
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        missing = options['recipes'] - Recipe.objects.count()
+        if missing > 0:
+            started = time.perf_counter()
+            self.seed(missing, generator)
+            self.stdout.write(
+                f'seeded {missing} recipes in '
+                f'{time.perf_counter() - started:.1f} s'
+            )
+        limit = options['limit']
+        queries = [
+            self.make_query(generator) for _ in range(options['queries'])
+        ]
+        engine = get_search_engine()
+        paths = {
+            'full-text': lambda query: engine.search(
+                Recipe.objects.all(), query
+            ).order_by(*settings.RECIPE_SEARCH_ORDERING)[:limit],
+            'icontains': lambda query: Recipe.objects.filter(
+                Q(name__icontains=query) | Q(text__icontains=query)
+            ).order_by(*settings.RECIPE_DEFAULT_ORDERING)[:limit],
+        }
+        self.stdout.write(
+            f'{Recipe.objects.count()} recipes, {len(queries)} queries, '
+            f'engine {type(engine).__name__}'
+        )
+        for path, search in paths.items():
+            timings = self.measure(search, queries)
+            self.stdout.write(
+                f'{path}: p50 {percentile(timings, 50):.3f} ms, '
+                f'p95 {percentile(timings, 95):.3f} ms, '
+                f'p99 {percentile(timings, 99):.3f} ms'
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import make_token
+from foodgram_backend import settings
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Команда для выдачи сотруднику токена профилирования запросов."""
+
+    help = 'print a signed X-Profile header value for a staff user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None or not user.is_staff:
+            raise CommandError('Токен выдается только сотрудникам.')
+        self.stdout.write(make_token(user.username))
+        self.stderr.write(
+            f'valid for {settings.PROFILING_TOKEN_MAX_AGE} seconds'
+        )
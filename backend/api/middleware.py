@@ -0,0 +1,216 @@
+import json
+import logging
+import random
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from api.profiling import RequestProfile, check_token
+from api.utils import QueryCounter, QueryRecorder
+from foodgram_backend import settings
+from recipes.metrics import (
+    DB_DURATION,
+    DB_QUERIES,
+    REQUEST_DURATION,
+    registry,
+)
+
+logger = logging.getLogger('api.sql')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Представление выполнило больше запросов, чем ему разрешено."""
+
+
+class MetricsMiddleware:
+    """Сбор метрик Prometheus по каждому запросу.
+
+    Время ответа, число SQL запросов и их суммарное время группируются
+    по имени маршрута DRF, чтобы число рядов не зависело от id в путях.
+    Отключается настройкой METRICS_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        if response.streaming and not getattr(
+            response, 'file_to_stream', None
+        ):
+            response.streaming_content = self.stream(
+                response.streaming_content,
+                request,
+                response,
+                counter,
+                started,
+            )
+        else:
+            self.finish(request, response, counter, started)
+        return response
+
+    def stream(self, content, request, response, counter, started):
+        with connection.execute_wrapper(counter):
+            yield from content
+        self.finish(request, response, counter, started)
+
+    def finish(self, request, response, counter, started):
+        route = getattr(request.resolver_match, 'view_name', 'unmatched')
+        REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            route,
+            request.method,
+            response.status_code,
+        )
+        DB_QUERIES.observe(counter.count, route)
+        DB_DURATION.observe(counter.duration, route)
+        registry.maybe_flush()
+
+
+class SQLInstrumentationMiddleware:
+    """Учет SQL запросов каждого запроса к API.
+
+    Включается настройкой SQL_INSTRUMENTATION, иначе Django исключает
+    middleware из цепочки при запуске. Считает запросы, их суммарное
+    время и повторяющиеся формы запросов (признак N+1), добавляет
+    заголовок Server-Timing и пишет строку лога в JSON. При превышении
+    бюджета SQL_QUERY_BUDGETS пишет предупреждение, а при
+    SQL_QUERY_BUDGET_STRICT выбрасывает исключение, чтобы тесты падали.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        response['Server-Timing'] = (
+            f'db;desc="{recorder.count} queries";'
+            f'dur={recorder.duration * 1000:.1f}, '
+            f'app;dur={(time.perf_counter() - started) * 1000:.1f}'
+        )
+        if response.streaming and not getattr(
+            response, 'file_to_stream', None
+        ):
+            # Потоковые ответы читают БД уже после возврата из view.
+            response.streaming_content = self.stream(
+                response.streaming_content,
+                request,
+                response,
+                recorder,
+                started,
+            )
+        else:
+            self.finish(request, response, recorder, started)
+        return response
+
+    def stream(self, content, request, response, recorder, started):
+        with connection.execute_wrapper(recorder):
+            yield from content
+        self.finish(request, response, recorder, started)
+
+    def finish(self, request, response, recorder, started):
+        view = getattr(request.resolver_match, 'view_name', None)
+        repeated = recorder.repeated(settings.SQL_REPEATED_QUERY_THRESHOLD)
+        budget = settings.SQL_QUERY_BUDGETS.get(view)
+        over_budget = budget is not None and recorder.count > budget
+        logger.log(
+            logging.WARNING if repeated or over_budget else logging.INFO,
+            json.dumps(
+                {
+                    'method': request.method,
+                    'path': request.path,
+                    'view': view,
+                    'status': response.status_code,
+                    'queries': recorder.count,
+                    'db_ms': round(recorder.duration * 1000, 3),
+                    'total_ms': round(
+                        (time.perf_counter() - started) * 1000, 3
+                    ),
+                    'budget': budget,
+                    'repeated': [
+                        {'sql': shape, 'count': count}
+                        for shape, count in repeated
+                    ],
+                },
+                ensure_ascii=False,
+            ),
+        )
+        if over_budget and settings.SQL_QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                f'{view}: {recorder.count} queries, budget {budget}'
+            )
+
+
+class ProfilingMiddleware:
+    """Профилирование отдельных запросов через cProfile.
+
+    Профилируется доля PROFILING_SAMPLE_RATE запросов и запросы сотрудников
+    с подписанным токеном в заголовке X-Profile (команда profiling_token).
+    Результат пишется в PROFILING_DIR, его имя возвращается в заголовке
+    X-Profile-Id. Без PROFILING_ENABLED middleware не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        staff = check_token(token) if token else None
+        if staff is None and (
+            random.random() >= settings.PROFILING_SAMPLE_RATE
+        ):
+            return self.get_response(request)
+        profile = RequestProfile()
+        started = time.perf_counter()
+        with profile:
+            response = self.get_response(request)
+        if response.streaming and not getattr(
+            response, 'file_to_stream', None
+        ):
+            response.streaming_content = self.stream(
+                response.streaming_content,
+                profile,
+                request,
+                response,
+                staff,
+                started,
+            )
+        else:
+            response['X-Profile-Id'] = self.finish(
+                profile, request, response, staff, started
+            )
+        return response
+
+    def stream(self, content, profile, request, response, staff, started):
+        with profile:
+            yield from content
+        self.finish(profile, request, response, staff, started)
+
+    def finish(self, profile, request, response, staff, started):
+        return profile.save(
+            {
+                'method': request.method,
+                'path': request.path,
+                'view': getattr(request.resolver_match, 'view_name', None),
+                'query': {
+                    name: values for name, values in request.GET.lists()
+                },
+                'status': response.status_code,
+                'total_ms': round((time.perf_counter() - started) * 1000, 3),
+                'requested_by': staff,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            },
+        )
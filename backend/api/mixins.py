@@ -0,0 +1,149 @@
+import hashlib
+import math
+import time
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from rest_framework.response import Response
+
+from foodgram_backend import settings
+from recipes.metrics import cache_lookup
+from recipes.versions import get_versions, user_version_name
+
+
+class DataVersionsMixin:
+    """Версии наборов данных version_names, нужные ответу вьюсета.
+
+    Для user_dependent вьюсетов добавляется версия отметок пользователя.
+    Версии читаются из БД одним запросом и запоминаются на время запроса.
+    """
+
+    version_names = ()
+    user_dependent = False
+
+    def get_version_names(self, request):
+        names = list(self.version_names)
+        if self.user_dependent and request.user.is_authenticated:
+            names.append(user_version_name(request.user.pk))
+        return names
+
+    def get_data_versions(self, request):
+        if getattr(self, '_data_versions', None) is None:
+            self._data_versions = get_versions(
+                self.get_version_names(request)
+            )
+        return self._data_versions
+
+
+class ConditionalGetMixin(DataVersionsMixin):
+    """Ответ 304 Not Modified по ETag и Last-Modified без сериализации.
+
+    Валидаторы строятся из версий наборов данных version_names, а для
+    user_dependent вьюсетов еще и из версии отметок пользователя.
+    """
+
+    def get_etag(self, request):
+        user = request.user.pk if self.user_dependent else None
+        validator = ':'.join(
+            [
+                request.get_full_path(),
+                str(user),
+                *(
+                    str(version)
+                    for version, _ in self.get_data_versions(request).values()
+                ),
+            ]
+        )
+        return quote_etag(hashlib.md5(validator.encode()).hexdigest())
+
+    def get_last_modified(self, request):
+        modified = [
+            modified
+            for _, modified in self.get_data_versions(request).values()
+        ]
+        if None in modified:
+            return None
+        # Last-Modified точен до секунды: если данные менялись в текущую
+        # секунду, следующее изменение в ту же секунду дало бы тот же
+        # заголовок и ответ 304. Такой ответ проверяется только по ETag.
+        last_modified = math.floor(max(modified).timestamp())
+        if last_modified >= math.floor(time.time()):
+            return None
+        return last_modified
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag = self.get_etag(request)
+        last_modified = self.get_last_modified(request)
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        cache_lookup('conditional_get', response is not None)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class AnonymousResponseCacheMixin(DataVersionsMixin):
+    """Кеширование ответов list и retrieve для анонимных пользователей.
+
+    Ключ строится из версий version_names, хоста, пути и нормализованных
+    параметров cache_query_params, поэтому после изменения данных старые
+    записи просто перестают запрашиваться и истекают сами.
+    """
+
+    cache_query_params = ()
+
+    def get_cache_key(self, request):
+        params = [
+            (name, sorted(request.query_params.getlist(name)))
+            for name in self.cache_query_params
+            if name in request.query_params
+        ]
+        versions = [
+            str(version)
+            for version, _ in self.get_data_versions(request).values()
+        ]
+        key = ':'.join([request.get_host(), request.path, str(params)])
+        return 'response:{}:{}'.format(
+            '.'.join(versions),
+            hashlib.md5(key.encode()).hexdigest(),
+        )
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        cache_lookup('anonymous_response', data is not None)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -1,7 +1,144 @@
+import base64
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram_backend import settings
 
 
 class RecipesPagination(pagination.PageNumberPagination):
     """Пагинация для страницы рецептов."""
 
     page_size_query_param = 'limit'
+
+
+class RecipeFeedPagination(RecipesPagination):
+    """Пагинация ленты рецептов по номеру страницы или по курсору.
+
+    С параметром cursor используется пагинация по ключу сортировки
+    запроса (по умолчанию -pub_date, -id) без COUNT и OFFSET, поэтому
+    стоимость страницы не зависит от глубины.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    ordering = settings.RECIPE_DEFAULT_ORDERING
+
+    def get_ordering(self, queryset):
+        return tuple(queryset.query.order_by) or self.ordering
+
+    def keyset_filter(self, ordering, position):
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        page_size = self.get_page_size(request)
+        direction, position = self.decode_cursor(
+            queryset, request.query_params[self.cursor_query_param]
+        )
+        ordering = self.ordering
+        if direction == 'previous':
+            ordering = tuple(
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in ordering
+            )
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, position))
+        page = list(queryset.order_by(*ordering)[: page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if direction == 'previous':
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = page
+        return page
+
+    def get_cursor_field(self, queryset, name):
+        name = name.lstrip('-')
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def encode_cursor(self, direction, recipe):
+        values = [direction]
+        for name in self.ordering:
+            value = getattr(recipe, name.lstrip('-'))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(str(value))
+        return base64.urlsafe_b64encode('|'.join(values).encode()).decode()
+
+    def decode_cursor(self, queryset, cursor):
+        if not cursor:
+            return 'next', None
+        try:
+            direction, *values = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            )
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = tuple(
+                self.get_cursor_field(queryset, name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            )
+        except (TypeError, ValueError, UnicodeDecodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('next', 'previous') or None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return direction, position
+
+    def get_cursor_link(self, direction, recipe):
+        return replace_query_param(
+            remove_query_param(self.base_url, self.page_query_param),
+            self.cursor_query_param,
+            self.encode_cursor(direction, recipe),
+        )
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.get_cursor_link('next', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_cursor_link('previous', self.page[0])
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                [
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
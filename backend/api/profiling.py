@@ -0,0 +1,129 @@
+import cProfile
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.core import signing
+
+from foodgram_backend import settings
+
+TOKEN_SALT = 'api.profiling'
+
+
+def make_token(username):
+    """Подписанный токен для заголовка X-Profile, выдается сотрудникам."""
+    return signing.dumps({'user': username}, salt=TOKEN_SALT)
+
+
+def check_token(token):
+    """Имя сотрудника из действующего токена или None."""
+    try:
+        return signing.loads(
+            token,
+            salt=TOKEN_SALT,
+            max_age=settings.PROFILING_TOKEN_MAX_AGE,
+        )['user']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def frame_name(code):
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+class StackSampler(threading.Thread):
+    """Выборка стеков потока запроса для свернутых стеков flamegraph.
+
+    cProfile хранит только пары вызывающий -> вызываемый, а цепочка
+    middleware Django вызывает одни и те же функции рекурсивно, поэтому
+    полные стеки снимаются отдельным потоком раз в
+    PROFILING_SAMPLE_INTERVAL секунд.
+    """
+
+    def __init__(self, thread_id, stacks):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks = stacks
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(settings.PROFILING_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class RequestProfile:
+    """Профиль запроса: статистика cProfile и выборка стеков.
+
+    Используется как контекстный менеджер, в том числе несколько раз,
+    если ответ отдается потоком после возврата из view.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.stacks = Counter()
+        self.sampler = None
+
+    def __enter__(self):
+        self.sampler = StackSampler(threading.get_ident(), self.stacks)
+        self.sampler.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.sampler.stop()
+
+    def collapsed(self):
+        return ''.join(
+            f'{stack} {count}\n'
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def save(self, details):
+        """Запись pstats, свернутых стеков и описания запроса в каталог.
+
+        Имя файлов начинается со времени и имени маршрута, старые профили
+        сверх PROFILING_MAX_FILES удаляются.
+        """
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        view = re.sub(r'[^\w.-]', '_', details['view'] or 'unmatched')
+        stem = os.path.join(
+            settings.PROFILING_DIR,
+            f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}'
+            f'-{time.time_ns() % 10 ** 9:09d}-{view}',
+        )
+        self.profiler.dump_stats(f'{stem}.prof')
+        with open(f'{stem}.collapsed', 'w', encoding='UTF-8') as file:
+            file.write(self.collapsed())
+        with open(f'{stem}.json', 'w', encoding='UTF-8') as file:
+            json.dump(details, file, ensure_ascii=False, indent=2)
+        rotate_profiles()
+        return os.path.basename(stem)
+
+
+def rotate_profiles():
+    profiles = sorted(
+        glob.glob(os.path.join(settings.PROFILING_DIR, '*.prof'))
+    )
+    for path in profiles[: -settings.PROFILING_MAX_FILES]:
+        stem = path[: -len('.prof')]
+        for extension in ('.prof', '.collapsed', '.json'):
+            try:
+                os.remove(f'{stem}{extension}')
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,55 @@
+from rest_framework import renderers
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from foodgram_backend import settings
+
+
+class ShoppingCartRenderer(renderers.JSONRenderer):
+    """Базовый рендерер для выгрузки списка покупок.
+
+    Сам файл отдается потоком в обход рендерера, через рендерер проходят
+    только сообщения об ошибках.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return super().render(data, None, renderer_context)
+
+
+class XLSXShoppingCartRenderer(ShoppingCartRenderer):
+    """Выгрузка списка покупок в формате xlsx."""
+
+    media_type = settings.EXTENSION_MIME_TYPE_XLSX
+    format = 'xlsx'
+
+
+class CSVShoppingCartRenderer(ShoppingCartRenderer):
+    """Выгрузка списка покупок в формате csv."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class TXTShoppingCartRenderer(ShoppingCartRenderer):
+    """Выгрузка списка покупок в формате txt."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class ShoppingCartNegotiation(DefaultContentNegotiation):
+    """Выбор формата выгрузки только по параметру format.
+
+    Заголовок Accept не учитывается: без параметра отдается xlsx, как
+    до появления других форматов, неизвестный формат дает 404.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        export_format = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE
+        )
+        if export_format:
+            renderers = self.filter_renderers(renderers, export_format)
+        return renderers[0], renderers[0].media_type
@@ -1,17 +1,30 @@
+import uuid
+
 from django.db import transaction
-from django.db.models import F
 
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from api.utils import adding_ingredients, check_repetitions, status_check
+from api.exceptions import ServiceUnavailable
+from api.fields import ImageVariantsField
+from api.utils import (
+    adding_ingredients,
+    check_repetitions,
+    status_check,
+    update_shopping_list_totals,
+    updating_ingredients,
+)
+from foodgram_backend import settings
+from recipes.images import DecoderUnavailable, check_uploaded_image
 from recipes.models import (
     Favorites,
     Ingredient,
     ProductsInRecipe,
     Recipe,
     ShoppingList,
+    ShoppingListTotal,
     Tag,
+    UploadedImage,
 )
 from users.serializers import CustomUserSerializer
 
@@ -65,6 +78,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -77,27 +91,69 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
     def get_ingredients(self, obj):
         """Получение игредиента в рецепте."""
-        return obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('productsinrecipe_recipe__amount'),
-        )
+        return [
+            {
+                'id': product.ingredient.id,
+                'name': product.ingredient.name,
+                'measurement_unit': product.ingredient.measurement_unit,
+                'amount': product.amount,
+            }
+            for product in obj.productsinrecipe_recipe.all()
+        ]
 
     def get_is_in_shopping_cart(self, obj):
         """Обработка поля, отвечающего за добавление рецепта в корзину."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return status_check(self.context.get('request'), obj, ShoppingList)
 
     def get_is_favorited(self, obj):
         """Обработка поля, отвечающего за добавление рецепта в избранное."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return status_check(self.context.get('request'), obj, Favorites)
 
+    def to_representation(self, instance):
+        """Передача аннотации подписки на автора в сериализатор автора."""
+        if hasattr(instance, 'is_subscribed_to_author'):
+            instance.author.is_subscribed = instance.is_subscribed_to_author
+        return super().to_representation(instance)
+
+
+class PantryRecipeSerializer(RecipeReadSerializer):
+    """Сериалайзер для рецептов, подобранных по продуктам."""
+
+    missing_count = serializers.IntegerField(read_only=True)
+    ingredients_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + (
+            'missing_count',
+            'ingredients_count',
+        )
+
+
+class PantrySerializer(serializers.Serializer):
+    """Сериалайзер для параметров поиска рецептов по продуктам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=settings.PANTRY_MAX_INGREDIENTS,
+    )
+    tags = serializers.ListField(
+        child=serializers.SlugField(),
+        required=False,
+        default=list,
+    )
+
 
 class ProductsInRecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер для колличества ингредиентов в рецепте."""
@@ -128,7 +184,13 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         many=True,
     )
-    image = Base64ImageField()
+    image = Base64ImageField(required=False)
+    image_id = serializers.PrimaryKeyRelatedField(
+        queryset=UploadedImage.objects.all(),
+        source='uploaded_image',
+        required=False,
+        write_only=True,
+    )
 
     class Meta:
         model = Recipe
@@ -136,6 +198,7 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
             'ingredients',
             'tags',
             'image',
+            'image_id',
             'name',
             'text',
             'cooking_time',
@@ -156,21 +219,52 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Повторение ингредиентов не допускается.'
             )
+        uploaded_image = data.get('uploaded_image')
+        if uploaded_image and data.get('image'):
+            raise serializers.ValidationError(
+                'Укажите либо фотографию, либо загруженную фотографию.'
+            )
+        if uploaded_image and (
+            uploaded_image.user != self.context.get('request').user
+        ):
+            raise serializers.ValidationError(
+                'Загруженная фотография принадлежит другому пользователю.'
+            )
+        if not self.partial and not uploaded_image and not data.get('image'):
+            raise serializers.ValidationError(
+                'Создать рецепт без фотографии нельзя.'
+            )
         return data
 
+    def attach_uploaded_image(self, validated_data):
+        """Подстановка загруженной заранее фотографии в рецепт."""
+        uploaded_image = validated_data.pop('uploaded_image', None)
+        if uploaded_image is not None:
+            validated_data['image'] = uploaded_image.image.name
+        return uploaded_image
+
     @transaction.atomic
     def create(self, validated_data):
         """Создание рецептов."""
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        uploaded_image = self.attach_uploaded_image(validated_data)
         validated_data['author'] = self.context.get('request').user
         recipe = Recipe.objects.create(**validated_data)
         adding_ingredients(recipe, ingredients)
         recipe.tags.set(tags)
+        if uploaded_image is not None:
+            uploaded_image.delete()
         return recipe
 
     def to_representation(self, instance):
         """Изменение выходных данных сериализатора."""
+        request = self.context.get('request')
+        instance = (
+            Recipe.objects.with_related()
+            .with_user_flags(request.user)
+            .get(pk=instance.pk)
+        )
         return RecipeReadSerializer(
             instance,
             context={
@@ -183,7 +277,7 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
         """Обновление рецептов."""
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        ProductsInRecipe.objects.filter(recipe=instance).delete()
+        uploaded_image = self.attach_uploaded_image(validated_data)
         instance.name = validated_data.get('name', instance.name)
         instance.image = validated_data.get('image', instance.image)
         instance.text = validated_data.get('text', instance.text)
@@ -192,8 +286,13 @@ class CreateUpdateDeleteRecipeSerializer(serializers.ModelSerializer):
             instance.cooking_time,
         )
         instance.save()
-        adding_ingredients(instance, ingredients)
+        update_shopping_list_totals(
+            instance,
+            *updating_ingredients(instance, ingredients),
+        )
         instance.tags.set(tags)
+        if uploaded_image is not None:
+            uploaded_image.delete()
         return instance
 
     def validate_tags(self, value):
@@ -252,11 +351,95 @@ class ShoppingListSerializer(serializers.ModelSerializer):
 class FavoriteAndShoppingListRecipeSerializer(serializers.ModelSerializer):
     """Сериалайзер для избранного и списка покупок в рецепте."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'image',
+            'image_variants',
             'name',
             'cooking_time',
         )
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    """Сериалайзер для пакетного добавления и удаления рецептов."""
+
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.RECIPE_BATCH_MAX_SIZE,
+        required=False,
+        default=list,
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.RECIPE_BATCH_MAX_SIZE,
+        required=False,
+        default=list,
+    )
+
+    def validate(self, data):
+        """Проверка, что рецепт не добавляется и не удаляется одновременно."""
+        data['add'] = list(dict.fromkeys(data['add']))
+        data['remove'] = list(dict.fromkeys(data['remove']))
+        if set(data['add']) & set(data['remove']):
+            raise serializers.ValidationError(
+                'Рецепт не может быть одновременно добавлен и удален.'
+            )
+        return data
+
+
+class ShoppingListTotalSerializer(serializers.ModelSerializer):
+    """Сериалайзер для суммы ингредиентов в списке покупок."""
+
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingListTotal
+        fields = (
+            'id',
+            'name',
+            'measurement_unit',
+            'amount',
+        )
+
+
+class UploadedImageSerializer(serializers.ModelSerializer):
+    """Сериалайзер для загрузки фотографии рецепта файлом."""
+
+    image = serializers.FileField()
+
+    class Meta:
+        model = UploadedImage
+        fields = (
+            'id',
+            'image',
+        )
+
+    def validate_image(self, value):
+        """Проверка фотографии в пуле процессов.
+
+        Имя файла от клиента не используется: файл сохраняется под
+        случайным именем с расширением формата, определенного по
+        содержимому, и только для форматов RECIPE_IMAGE_UPLOAD_FORMATS.
+        Занятый или сломанный пул - ответ 503, а не ошибка в файле.
+        """
+        try:
+            image_format, _, _ = check_uploaded_image(value)
+        except DecoderUnavailable as error:
+            raise ServiceUnavailable(str(error))
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+        extension = settings.RECIPE_IMAGE_UPLOAD_FORMATS.get(image_format)
+        if extension is None:
+            raise serializers.ValidationError(
+                'Загрузите фотографию в формате JPEG, PNG или WebP.'
+            )
+        value.name = f'{uuid.uuid4().hex}.{extension}'
+        return value
@@ -1,11 +1,14 @@
-import os
-
-from django.db.models import Sum
+import csv
+import re
+import tempfile
+import time
+from collections import Counter
 
 from openpyxl import Workbook
 
 from foodgram_backend import settings
-from recipes.models import ProductsInRecipe
+from recipes.metrics import EXPORT_DURATION, EXPORT_SIZE
+from recipes.models import ProductsInRecipe, ShoppingList, ShoppingListTotal
 
 
 def status_check(request, serializable_object, model):
@@ -20,54 +23,204 @@ def status_check(request, serializable_object, model):
 
 
 def adding_ingredients(instance, ingredients):
-    """Добавление ингредиентов к рецепту при создании и обновлении."""
-    for ingredient in ingredients:
-        ProductsInRecipe.objects.create(
+    """Добавление ингредиентов к рецепту одним запросом."""
+    ProductsInRecipe.objects.bulk_create(
+        ProductsInRecipe(
             recipe=instance,
             ingredient=ingredient.get('id'),
             amount=ingredient.get('amount'),
         )
+        for ingredient in ingredients
+    )
 
 
-def preparing_data_for_sending(request):
-    """Подготовка данных для отправки списка покупок пользователю."""
-    ingredient_data = []
-    file_name = os.path.join(
-        settings.BASE_DIR,
-        'recipes',
-        request.user.username + '_ingredients.xlsx',
-    )
-    ingredients = (
+def updating_ingredients(instance, ingredients):
+    """Изменение только тех ингредиентов рецепта, которые поменялись.
+
+    Возвращает количества ингредиентов до и после изменения.
+    """
+    products = {
+        product.ingredient_id: product
+        for product in ProductsInRecipe.objects.filter(
+            recipe=instance
+        ).order_by()
+    }
+    old_amounts = {
+        ingredient_id: product.amount
+        for ingredient_id, product in products.items()
+    }
+    new_amounts = {
+        ingredient.get('id').pk: ingredient.get('amount')
+        for ingredient in ingredients
+    }
+    removed = old_amounts.keys() - new_amounts.keys()
+    if removed:
         ProductsInRecipe.objects.filter(
-            recipe__shoppinglists__user=request.user
+            recipe=instance,
+            ingredient_id__in=removed,
+        ).delete()
+    changed = []
+    for ingredient_id, product in products.items():
+        amount = new_amounts.get(ingredient_id, product.amount)
+        if amount != product.amount:
+            product.amount = amount
+            changed.append(product)
+    if changed:
+        ProductsInRecipe.objects.bulk_update(changed, ('amount',))
+    added = [
+        ingredient
+        for ingredient in ingredients
+        if ingredient.get('id').pk not in products
+    ]
+    if added:
+        adding_ingredients(instance, added)
+    return old_amounts, new_amounts
+
+
+def update_shopping_list_totals(recipe, old_amounts, new_amounts):
+    """Пересчет списков покупок после изменения ингредиентов рецепта."""
+    amounts = {
+        ingredient_id: new_amounts.get(ingredient_id, 0)
+        - old_amounts.get(ingredient_id, 0)
+        for ingredient_id in new_amounts.keys() | old_amounts.keys()
+    }
+    if any(amounts.values()):
+        ShoppingListTotal.objects.add_amounts(
+            ShoppingList.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True
+            ),
+            amounts,
         )
-        .values(
+
+
+class QueryCounter:
+    """Счетчик SQL запросов и их времени для connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+SQL_LITERALS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\?(?:, \?)+\)'), '(...)'),
+)
+
+
+def normalize_sql(sql):
+    """Форма запроса: литералы и параметры заменены на ?, списки свернуты."""
+    for pattern, replacement in SQL_LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class QueryRecorder(QueryCounter):
+    """Счетчик запросов, который дополнительно считает их формы."""
+
+    def __init__(self):
+        super().__init__()
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[normalize_sql(sql)] += 1
+        return super().__call__(execute, sql, params, many, context)
+
+    def repeated(self, threshold):
+        """Формы, выполненные не меньше threshold раз - признак N+1."""
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class Echo:
+    """Буфер, возвращающий записанную строку вместо ее сохранения."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_cart_ingredients(user):
+    """Суммарное количество ингредиентов из списка покупок пользователя."""
+    return (
+        ShoppingListTotal.objects.filter(
+            user=user,
+        )
+        .values_list(
             'ingredient__name',
             'ingredient__measurement_unit',
+            'amount',
         )
         .order_by(
             'ingredient__name',
         )
-        .annotate(
-            amount=Sum('amount'),
-        )
     )
-    for ingredient in ingredients:
-        (*data,) = ingredient.values()
-        ingredient_data.append(data)
-    shopping_cart = Workbook()
-    list = shopping_cart.active
-    list.append(
-        (
-            'Название ингредиента',
-            'Единица измерения',
-            'Количество в рецепте',
-        )
+
+
+def shopping_cart_rows(user):
+    """Построчная выборка списка покупок через серверный курсор."""
+    yield settings.SHOPPING_CART_HEADER
+    yield from shopping_cart_ingredients(user).iterator(
+        chunk_size=settings.SHOPPING_CART_CHUNK_SIZE
     )
-    for ingredient in ingredient_data:
-        list.append(ingredient)
-    shopping_cart.save(file_name)
-    return file_name
+
+
+def shopping_cart_to_csv(rows):
+    """Потоковая выгрузка списка покупок в формате csv."""
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def shopping_cart_to_txt(rows):
+    """Потоковая выгрузка списка покупок в формате txt."""
+    next(rows)
+    for name, measurement_unit, amount in rows:
+        yield f'{name} ({measurement_unit}) — {amount}\n'
+
+
+def shopping_cart_to_xlsx(rows):
+    """Формирование списка покупок в формате xlsx во временном файле.
+
+    Файл остается в памяти до SHOPPING_CART_XLSX_MEMORY_SIZE байт, а
+    больший сбрасывается на диск. Возвращает файл и его размер.
+    """
+    started = time.perf_counter()
+    shopping_cart = Workbook(write_only=True)
+    sheet = shopping_cart.create_sheet()
+    for row in rows:
+        sheet.append(row)
+    stream = tempfile.SpooledTemporaryFile(
+        max_size=settings.SHOPPING_CART_XLSX_MEMORY_SIZE
+    )
+    shopping_cart.save(stream)
+    size = stream.tell()
+    stream.seek(0)
+    EXPORT_DURATION.observe(time.perf_counter() - started, 'xlsx')
+    EXPORT_SIZE.observe(size, 'xlsx')
+    return stream, size
+
+
+def measured_export(chunks, export_format):
+    """Учет времени и размера потоковой выгрузки после ее отправки."""
+    started = time.perf_counter()
+    size = 0
+    for chunk in chunks:
+        size += len(chunk.encode())
+        yield chunk
+    EXPORT_DURATION.observe(time.perf_counter() - started, export_format)
+    EXPORT_SIZE.observe(size, export_format)
 
 
 def check_repetitions(value):
@@ -84,3 +237,12 @@ def check_subscribed(request, model, obj):
             user=request.user.pk,
         ).exists()
     )
+
+
+def get_recipes_limit(request):
+    """Количество рецептов автора в подписках с ограничением сверху."""
+    try:
+        recipes_limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return settings.SUBSCRIPTION_RECIPES_LIMIT
+    return max(0, min(recipes_limit, settings.SUBSCRIPTION_RECIPES_MAX_LIMIT))
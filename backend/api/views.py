@@ -1,58 +1,131 @@
-from django.http import FileResponse
+from django.db import transaction
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from api.filters import IngredientsFilter, RecipeFilter
-from api.pagination import RecipesPagination
+from api.filters import RecipeFilter
+from api.indexes import get_ingredient_index, get_recipe_ingredient_index
+from api.mixins import AnonymousResponseCacheMixin, ConditionalGetMixin
+from api.pagination import RecipeFeedPagination, RecipesPagination
 from api.permissions import ReadOrAddUpdateDelRecipePermissions
+from api.renderers import (
+    CSVShoppingCartRenderer,
+    ShoppingCartNegotiation,
+    TXTShoppingCartRenderer,
+    XLSXShoppingCartRenderer,
+)
 from api.serializers import (
     CreateUpdateDeleteRecipeSerializer,
     FavoriteAndShoppingListRecipeSerializer,
     FavoritesSerializer,
     IngredientSerializer,
+    PantryRecipeSerializer,
+    PantrySerializer,
+    RecipeBatchSerializer,
     RecipeReadSerializer,
     ShoppingListSerializer,
+    ShoppingListTotalSerializer,
     TagSerializer,
+    UploadedImageSerializer,
+)
+from api.utils import (
+    measured_export,
+    shopping_cart_rows,
+    shopping_cart_to_csv,
+    shopping_cart_to_txt,
+    shopping_cart_to_xlsx,
 )
-from api.utils import preparing_data_for_sending
 from foodgram_backend import settings
-from recipes.models import Favorites, Ingredient, Recipe, ShoppingList, Tag
+from recipes.metrics import registry
+from recipes.models import (
+    Favorites,
+    Ingredient,
+    Recipe,
+    ShoppingList,
+    ShoppingListTotal,
+    Tag,
+)
 
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class TagsViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для получения тегов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    version_names = ('tags',)
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для получения ингредиентов."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientsFilter
+    version_names = ('ingredients',)
+
+    def list(self, request, *args, **kwargs):
+        """Автодополнение ингредиентов по индексу без запросов к БД.
 
+        Читается только версия ингредиентов, общая для ETag и индекса.
+        """
+        return self.conditional_response(request, self.autocomplete)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def autocomplete(self, request):
+        """Поиск ингредиентов по префиксному индексу."""
+        version, _ = self.get_data_versions(request)['ingredients']
+        return Response(
+            get_ingredient_index(version).search(
+                request.query_params.get('name', '')
+            )
+        )
+
+
+class RecipeViewSet(
+    ConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    viewsets.ModelViewSet,
+):
     """Вьюсет для рецептов."""
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeReadSerializer
     permission_classes = (ReadOrAddUpdateDelRecipePermissions,)
-    pagination_class = RecipesPagination
+    pagination_class = RecipeFeedPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    version_names = ('recipes',)
+    user_dependent = True
+    cache_query_params = (
+        'page',
+        'limit',
+        'cursor',
+        'tags',
+        'author',
+        'ordering',
+        'search',
+    )
+
+    def get_queryset(self):
+        """Рецепты с автором, тегами, ингредиентами и отметками."""
+        if self.request.method == 'GET':
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user
+            )
+        return super().get_queryset()
 
     def get_serializer_class(self):
         """Выбор сериализатора в зависимости от метода запроса."""
@@ -60,6 +133,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return CreateUpdateDeleteRecipeSerializer
 
+    def add_or_remove_recipe(self, request, model, recipe_id, errors):
+        """Добавление и удаление рецепта одним запросом к БД."""
+        if request.method == 'POST':
+            recipe = get_object_or_404(Recipe, id=recipe_id)
+            if not model.objects.add_recipes(request.user, [recipe.pk]):
+                return Response(
+                    {'errors': errors['POST']},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            serializer = FavoriteAndShoppingListRecipeSerializer(
+                instance=recipe
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if model.objects.remove_recipes(request.user, [int(recipe_id)]):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, id=recipe_id)
+        return Response(
+            {'errors': errors['DELETE']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def add_and_remove_recipes(self, request, model):
+        """Пакетное добавление и удаление рецептов."""
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            added = model.objects.add_recipes(
+                request.user, serializer.validated_data['add']
+            )
+            removed = model.objects.remove_recipes(
+                request.user, serializer.validated_data['remove']
+            )
+        return Response({'added': added, 'removed': removed})
+
     @action(
         detail=False,
         url_path=r'(?P<id>\d+)/favorite',
@@ -69,41 +176,25 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, *args, **kwargs):
         """Добавление и удаление рецепта из избранного."""
-        recipe_id = kwargs.get('id')
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        user = request.user
-        check_favorite = Favorites.objects.filter(
-            recipe=recipe,
-            user=user,
-        ).exists()
-        if request.method == 'POST':
-            if not check_favorite:
-                Favorites.objects.create(
-                    recipe=recipe,
-                    user=user,
-                )
-                serializer = FavoriteAndShoppingListRecipeSerializer(
-                    instance=recipe
-                )
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
-            return Response(
-                {'errors': 'Рецепт уже в избранном.'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        if request.method == 'DELETE':
-            if check_favorite:
-                Favorites.objects.filter(
-                    recipe=recipe,
-                    user=user,
-                ).delete()
-
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(
-                {'errors': 'Пользователь не добавлял рецепт в избранное'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        return self.add_or_remove_recipe(
+            request,
+            Favorites,
+            kwargs.get('id'),
+            {
+                'POST': 'Рецепт уже в избранном.',
+                'DELETE': 'Пользователь не добавлял рецепт в избранное',
+            },
+        )
+
+    @action(
+        detail=False,
+        url_path='favorite/batch',
+        methods=['post'],
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_batch(self, request):
+        """Пакетное добавление и удаление рецептов из избранного."""
+        return self.add_and_remove_recipes(request, Favorites)
 
     @action(
         detail=False,
@@ -114,51 +205,167 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, *args, **kwargs):
         """Добавление и удаление рецепта из списка покупок."""
-        recipe_id = kwargs.get('id')
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        user = request.user
-        check_favorite = ShoppingList.objects.filter(
-            recipe=recipe,
-            user=user,
-        ).exists()
-        if request.method == 'POST':
-            if not check_favorite:
-                ShoppingList.objects.create(
-                    recipe=recipe,
-                    user=user,
-                )
-                serializer = FavoriteAndShoppingListRecipeSerializer(
-                    instance=recipe
-                )
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
-            return Response(
-                {'errors': 'Рецепт уже в списке покупок.'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        if request.method == 'DELETE':
-            if check_favorite:
-                ShoppingList.objects.filter(
-                    recipe=recipe,
-                    user=user,
-                ).delete()
-
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(
-                {'errors': 'Пользователь не добавил рецепт в список покупок'},
-                status=status.HTTP_400_BAD_REQUEST,
+        return self.add_or_remove_recipe(
+            request,
+            ShoppingList,
+            kwargs.get('id'),
+            {
+                'POST': 'Рецепт уже в списке покупок.',
+                'DELETE': 'Пользователь не добавил рецепт в список покупок',
+            },
+        )
+
+    @action(
+        detail=False,
+        url_path='shopping_cart/batch',
+        methods=['post'],
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_batch(self, request):
+        """Пакетное добавление и удаление рецептов из списка покупок."""
+        return self.add_and_remove_recipes(request, ShoppingList)
+
+    @action(
+        detail=False,
+        url_path='shopping_cart/from_favorites',
+        methods=['post'],
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_from_favorites(self, request):
+        """Добавление всех рецептов из избранного в список покупок."""
+        added = ShoppingList.objects.add_recipes(
+            request.user,
+            Favorites.objects.filter(user=request.user).values('recipe_id'),
+        )
+        return Response({'added': added})
+
+    @action(
+        detail=False,
+        url_path='shopping_cart',
+        methods=['delete'],
+        permission_classes=(IsAuthenticated,),
+    )
+    def clear_shopping_cart(self, request):
+        """Очистка списка покупок."""
+        ShoppingList.objects.remove_recipes(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(AllowAny,),
+        pagination_class=RecipesPagination,
+    )
+    def pantry(self, request):
+        """Рецепты, которые можно приготовить из имеющихся продуктов."""
+        params = PantrySerializer(
+            data={
+                'ingredients': request.query_params.getlist('ingredients'),
+                'tags': request.query_params.getlist('tags'),
+            }
+        )
+        params.is_valid(raise_exception=True)
+        ranked = self.paginate_queryset(
+            get_recipe_ingredient_index().rank(
+                params.validated_data['ingredients'],
+                params.validated_data['tags'],
             )
+        )
+        recipes = (
+            Recipe.objects.with_related()
+            .with_user_flags(request.user)
+            .in_bulk([recipe_id for recipe_id, _, _ in ranked])
+        )
+        page = []
+        for recipe_id, missing, total in ranked:
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.missing_count = missing
+                recipe.ingredients_count = total
+                page.append(recipe)
+        serializer = PantryRecipeSerializer(
+            page, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='images',
+        permission_classes=(IsAuthenticated,),
+        parser_classes=(MultiPartParser,),
+    )
+    def upload_image(self, request):
+        """Загрузка фотографии рецепта файлом до создания рецепта."""
+        serializer = UploadedImageSerializer(
+            data=request.data,
+            context={'request': request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(
         detail=False,
         methods=['get'],
         permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            XLSXShoppingCartRenderer,
+            CSVShoppingCartRenderer,
+            TXTShoppingCartRenderer,
+        ),
+        content_negotiation_class=ShoppingCartNegotiation,
     )
     def download_shopping_cart(self, request):
-        """Отправка списка покупок пользователю в формате xlsx."""
-        file = preparing_data_for_sending(request)
-        return FileResponse(
-            open(file, 'rb'),
-            content_type=settings.EXTENSION_MIME_TYPE_XLSX,
+        """Отправка списка покупок пользователю в формате xlsx, csv или txt."""
+        renderer = request.accepted_renderer
+        file_name = f'{settings.SHOPPING_CART_FILE_NAME}.{renderer.format}'
+        rows = shopping_cart_rows(request.user)
+        if renderer.format == 'xlsx':
+            stream, size = shopping_cart_to_xlsx(rows)
+            response = FileResponse(
+                stream,
+                as_attachment=True,
+                filename=file_name,
+                content_type=renderer.media_type,
+            )
+            response['Content-Length'] = size
+            return response
+        writers = {
+            'csv': shopping_cart_to_csv,
+            'txt': shopping_cart_to_txt,
+        }
+        response = StreamingHttpResponse(
+            measured_export(writers[renderer.format](rows), renderer.format),
+            content_type=f'{renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{file_name}"'
         )
+        return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        pagination_class=None,
+    )
+    def shopping_cart_totals(self, request):
+        """Суммарное количество ингредиентов в списке покупок."""
+        serializer = ShoppingListTotalSerializer(
+            ShoppingListTotal.objects.filter(user=request.user)
+            .select_related('ingredient')
+            .order_by('ingredient__name'),
+            many=True,
+        )
+        return Response(serializer.data)
+
+
+def metrics(request):
+    """Метрики всех процессов приложения в текстовом формате Prometheus."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
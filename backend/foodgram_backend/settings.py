@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timezone
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -33,6 +34,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.SQLInstrumentationMiddleware',
+    'api.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,7 +75,7 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
@@ -80,6 +84,18 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -147,5 +163,123 @@ EXTENSION_MIME_TYPE_XLSX = (
     'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 )
 
+SUBSCRIPTION_RECIPES_LIMIT = 10
+
+SUBSCRIPTION_RECIPES_MAX_LIMIT = 50
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+
+RECIPE_IMAGE_FORMATS = ('jpeg', 'webp')
+
+RECIPE_IMAGE_QUALITY = 82
+
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+RECIPE_IMAGE_DECODE_WORKERS = int(os.getenv('RECIPE_IMAGE_DECODE_WORKERS', 2))
+
+RECIPE_IMAGE_DECODE_TIMEOUT = 30
+
+RECIPE_IMAGE_MAX_BYTES = 20 * 1024 * 1024
 
-DIRECTORY_FOR_SHOPING_LIST_FILE = 'recipes/data/'
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+
+RECIPE_IMAGE_UPLOAD_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+SHOPPING_CART_FILE_NAME = 'shopping_cart'
+
+SHOPPING_CART_HEADER = (
+    'Название ингредиента',
+    'Единица измерения',
+    'Количество в рецепте',
+)
+
+SHOPPING_CART_CHUNK_SIZE = 500
+
+SHOPPING_CART_XLSX_MEMORY_SIZE = 1024 * 1024
+
+RECIPE_BATCH_MAX_SIZE = 500
+
+RECIPE_ORDERINGS = {
+    'popular': ('-popular_score', '-pub_date', '-id'),
+    'trending': ('-trending_score', '-pub_date', '-id'),
+}
+
+RECIPE_DEFAULT_ORDERING = ('-pub_date', '-id')
+
+RECIPE_SCORE_WEIGHTS = {
+    'favorites': 1.0,
+    'shoppinglists': 0.5,
+}
+
+RECIPE_TRENDING_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+RECIPE_TRENDING_HALF_LIFE_HOURS = 24
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+RECIPE_SEARCH_ORDERING = ('-search_rank', '-pub_date', '-id')
+
+PANTRY_MAX_INGREDIENTS = 200
+
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION') == 'True'
+
+SQL_QUERY_BUDGET_STRICT = os.getenv('SQL_QUERY_BUDGET_STRICT') == 'True'
+
+SQL_REPEATED_QUERY_THRESHOLD = 5
+
+SQL_QUERY_BUDGETS = {
+    'recipe-list': 6,
+    'recipe-detail': 5,
+    'recipe-pantry': 8,
+    'recipe-download-shopping-cart': 3,
+    'recipe-shopping-cart-totals': 3,
+    'user-list': 5,
+    'user-subscriptions': 5,
+    'tag-list': 3,
+    'ingredient-list': 3,
+}
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+METRICS_FLUSH_INTERVAL = 5
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED') == 'True'
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+
+PROFILING_SAMPLE_INTERVAL = 0.001
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+
+PROFILING_MAX_FILES = 200
+
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'api.sql': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
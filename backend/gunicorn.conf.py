@@ -0,0 +1,12 @@
+def on_starting(server):
+    """Очистка метрик прошлого запуска до создания воркеров."""
+    from recipes.metrics import clear_directory
+
+    clear_directory()
+
+
+def child_exit(server, worker):
+    """Перенос метрик завершившегося воркера в архив."""
+    from recipes.metrics import archive_worker
+
+    archive_worker(worker.pid)
@@ -6,6 +6,7 @@ from .models import (
     ProductsInRecipe,
     Recipe,
     ShoppingList,
+    ShoppingListTotal,
     Subscription,
     Tag,
 )
@@ -70,8 +71,10 @@ class RecipeAdmin(BaseAdmin):
     list_display = (
         'name',
         'author',
+        'favorites_count',
+        'in_carts_count',
     )
-    readonly_fields = ('count_favorites',)
+    readonly_fields = ('favorites_count', 'in_carts_count')
     fields = (
         'author',
         'name',
@@ -79,16 +82,12 @@ class RecipeAdmin(BaseAdmin):
         'text',
         'cooking_time',
         'tags',
-        'count_favorites',
+        'favorites_count',
+        'in_carts_count',
     )
     list_filter = ('name', 'author', 'tags')
     search_fields = ('name__startswith',)
 
-    @admin.display(description='рецепт добавлен в избранное')
-    def count_favorites(self, obj):
-        """Количество рецептов, добавленных в избранное."""
-        return obj.favorites.count()
-
 
 @admin.register(Favorites)
 class FavoritesAdmin(BaseAdmin):
@@ -112,3 +111,14 @@ class ShoppingListAdmin(BaseAdmin):
         'recipe',
         'user',
     )
+
+
+@admin.register(ShoppingListTotal)
+class ShoppingListTotalAdmin(BaseAdmin):
+    """Регистрация модели суммы ингредиентов в списке покупок."""
+
+    list_display = (
+        'user',
+        'ingredient',
+        'amount',
+    )
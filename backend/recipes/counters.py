@@ -0,0 +1,47 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def change_counter(queryset, field, delta):
+    """Изменение счетчика одним UPDATE без чтения строк."""
+    return queryset.update(**{field: F(field) + delta})
+
+
+def expected_count(model, related_field):
+    """Подзапрос с фактическим количеством связанных строк."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+class DerivedFieldsMixin:
+    """Исключение денормализованных полей из полного сохранения строки.
+
+    Счетчики и оценки меняются только через UPDATE с F() и пересчеты,
+    поэтому save() существующей строки не должен записывать обратно
+    значения, прочитанные в начале запроса.
+    """
+
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.derived_fields
+            ]
+        return super().save(*args, **kwargs)
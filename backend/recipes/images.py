@@ -0,0 +1,220 @@
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection
+
+from PIL import Image, ImageOps, features
+
+from foodgram_backend import settings
+from recipes.metrics import IMAGE_DECODE_DURATION
+from recipes.models import Recipe
+from recipes.versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+}
+
+
+class DecoderUnavailable(Exception):
+    """Пул декодирования фотографий занят или перезапускается."""
+
+
+_executor = None
+_process_pool = None
+_lock = threading.Lock()
+_decode_slots = threading.BoundedSemaphore(
+    settings.RECIPE_IMAGE_DECODE_WORKERS * 2
+)
+
+
+def get_executor():
+    """Пул потоков процесса для обработки фотографий."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+    return _executor
+
+
+def variants_are_stale(recipe):
+    """Уменьшенные копии не построены для текущей фотографии."""
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name
+    )
+
+
+def schedule_variants(recipe_id):
+    """Постановка построения копий фотографии в очередь пула."""
+    if not settings.RECIPE_IMAGE_WORKERS:
+        build_variants_safely(recipe_id)
+        return
+    get_executor().submit(build_variants_in_pool, recipe_id)
+
+
+def build_variants_in_pool(recipe_id):
+    """Построение копий в потоке пула с собственным соединением с БД.
+
+    Django закрывает устаревшие соединения только по сигналам запросов,
+    поэтому поток пула проверяет соединение перед работой и закрывает
+    его после, чтобы не держать его открытым и не наследовать разрыв.
+    """
+    close_old_connections()
+    try:
+        build_variants_safely(recipe_id)
+    finally:
+        connection.close()
+
+
+def build_variants_safely(recipe_id):
+    try:
+        build_variants(recipe_id)
+    except Exception:
+        logger.exception('image variants failed for recipe %s', recipe_id)
+
+
+def build_variants(recipe_id, force=False):
+    """Построение уменьшенных копий фотографии рецепта в jpeg и webp."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return False
+    if not force and not variants_are_stale(recipe):
+        return False
+    source = recipe.image.name
+    started = time.perf_counter()
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    IMAGE_DECODE_DURATION.observe(time.perf_counter() - started, 'variants')
+    stem = os.path.splitext(os.path.basename(source))[0]
+    formats = [
+        image_format
+        for image_format in settings.RECIPE_IMAGE_FORMATS
+        if image_format != 'webp' or features.check('webp')
+    ]
+    variants = {'source': source}
+    for name, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[name] = {}
+        for image_format in formats:
+            pillow_format, extension = IMAGE_FORMATS[image_format]
+            buffer = io.BytesIO()
+            resized.save(
+                buffer,
+                pillow_format,
+                quality=settings.RECIPE_IMAGE_QUALITY,
+                optimize=True,
+            )
+            variants[name][image_format] = default_storage.save(
+                f'recipes/images/variants/{stem}_{name}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants
+    )
+    stale = recipe.image_variants if updated else variants
+    for name, paths in stale.items():
+        if name != 'source':
+            for path in paths.values():
+                default_storage.delete(path)
+    if updated:
+        bump_version('recipes')
+    return bool(updated)
+
+
+def get_process_pool():
+    """Пул процессов для декодирования загруженных фотографий."""
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_DECODE_WORKERS
+            )
+    return _process_pool
+
+
+def reset_process_pool(pool, terminate=False):
+    """Замена сломанного или зависшего пула процессов новым.
+
+    Следующий вызов get_process_pool создаст пул заново. При terminate
+    рабочие процессы завершаются сразу, не дожидаясь текущих задач.
+    """
+    global _process_pool
+    with _lock:
+        if _process_pool is pool:
+            _process_pool = None
+    if terminate:
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False)
+
+
+def inspect_image(source, max_pixels):
+    """Проверка фотографии: формат, размеры и целостность данных.
+
+    Выполняется в отдельном процессе, source - путь к файлу или байты.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(source) as image:
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ValueError('too many pixels')
+        image.verify()
+        return image.format, width, height
+
+
+def check_uploaded_image(file):
+    """Проверка загруженного файла в пуле процессов с ограничениями.
+
+    Возвращает формат и размеры фотографии, при ошибке в файле -
+    ValueError, если пул занят или сломан - DecoderUnavailable.
+    Сломанный пул и пул с зависшим декодированием пересоздаются.
+    """
+    if file.size > settings.RECIPE_IMAGE_MAX_BYTES:
+        raise ValueError('Файл фотографии слишком большой.')
+    if hasattr(file, 'temporary_file_path'):
+        source = file.temporary_file_path()
+    else:
+        file.seek(0)
+        source = file.read()
+        file.seek(0)
+    if not _decode_slots.acquire(
+        timeout=settings.RECIPE_IMAGE_DECODE_TIMEOUT
+    ):
+        raise DecoderUnavailable('Сервер занят, повторите загрузку позже.')
+    started = time.perf_counter()
+    pool = get_process_pool()
+    try:
+        future = pool.submit(
+            inspect_image, source, settings.RECIPE_IMAGE_MAX_PIXELS
+        )
+        return future.result(timeout=settings.RECIPE_IMAGE_DECODE_TIMEOUT)
+    except FutureTimeoutError:
+        logger.warning('image decode timed out, recycling process pool')
+        reset_process_pool(pool, terminate=True)
+        raise ValueError('Фотография обрабатывается слишком долго.')
+    except BrokenProcessPool:
+        logger.exception('image decode pool is broken, recreating')
+        reset_process_pool(pool)
+        raise DecoderUnavailable('Сервер занят, повторите загрузку позже.')
+    except Exception:
+        raise ValueError('Загрузите корректную фотографию.')
+    finally:
+        _decode_slots.release()
+        IMAGE_DECODE_DURATION.observe(time.perf_counter() - started, 'upload')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Команда для построения уменьшенных копий фотографий рецептов."""
+
+    help = 'build missing or outdated recipe image variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='rebuild variants for every recipe',
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        for recipe_id in Recipe.objects.values_list('pk', flat=True):
+            built += build_variants(recipe_id, options['force'])
+        self.stdout.write(
+            self.style.SUCCESS(f'image variants built for {built} recipes')
+        )
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import UploadedImage
+
+
+class Command(BaseCommand):
+    """Команда для удаления фотографий, не привязанных к рецептам."""
+
+    help = 'delete uploaded images that were never attached to a recipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        stale = UploadedImage.objects.filter(
+            created__lt=timezone.now() - timedelta(hours=options['hours'])
+        )
+        count = 0
+        for uploaded_image in stale.iterator():
+            uploaded_image.image.delete(save=False)
+            uploaded_image.delete()
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'{count} uploaded images deleted')
+        )
@@ -0,0 +1,138 @@
+import statistics
+import time
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, migrations
+from django.db.models import Sum
+
+from recipes.models import (
+    Favorites,
+    Ingredient,
+    ProductsInRecipe,
+    Recipe,
+    ShoppingList,
+    Subscription,
+)
+from users.models import User
+
+INDEX_MIGRATION = 'recipes.migrations.0006_hot_lookup_indexes'
+
+
+class Command(BaseCommand):
+    """Планы и время выполнения самых частых запросов."""
+
+    help = 'print EXPLAIN output and timings of hot queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed-recipes',
+            type=int,
+            default=0,
+            help='create this many synthetic recipes before measuring',
+        )
+        parser.add_argument(
+            '--before-after',
+            action='store_true',
+            help='measure without the index migration, then with it',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, count, seed):
+        """Синтетический набор данных для замеров."""
+        users = max(10, count // 20)
+        call_command(
+            'generate_data',
+            users=users,
+            recipes=count,
+            favorites=users * 20,
+            cart_entries=users * 20,
+            subscriptions=users * 5,
+            seed=seed,
+            stdout=self.stdout,
+        )
+
+    def switch_indexes(self, create):
+        """Удаление или восстановление индексов из миграции 0006.
+
+        Остальная схема не меняется, индексы, удаленные более поздними
+        миграциями, пропускаются.
+        """
+        operations = import_module(INDEX_MIGRATION).Migration.operations
+        with connection.schema_editor() as editor:
+            for operation in operations:
+                if isinstance(operation, migrations.AddIndex):
+                    model = apps.get_model('recipes', operation.model_name)
+                    if operation.index.name not in {
+                        index.name for index in model._meta.indexes
+                    }:
+                        continue
+                    if create:
+                        editor.add_index(model, operation.index)
+                    else:
+                        editor.remove_index(model, operation.index)
+                elif isinstance(operation, migrations.RunPython):
+                    code = operation.code if create else operation.reverse_code
+                    code(apps, editor)
+
+    def queries(self):
+        recipe = Recipe.objects.order_by('?').first()
+        user = User.objects.filter(shoppinglists__isnull=False).first()
+        user = user or User.objects.first()
+        return {
+            'recipe feed': Recipe.objects.order_by('-pub_date', '-id')[:6],
+            'ingredient prefix': Ingredient.objects.filter(
+                name__istartswith='сах'
+            ),
+            'favorite check': Favorites.objects.filter(
+                recipe=recipe, user=user
+            ),
+            'shopping list check': ShoppingList.objects.filter(
+                recipe=recipe, user=user
+            ),
+            'subscription check': Subscription.objects.filter(
+                author=recipe.author_id, user=user
+            ),
+            'shopping cart aggregation': (
+                ProductsInRecipe.objects.filter(
+                    recipe__shoppinglists__user=user
+                )
+                .values('ingredient__name', 'ingredient__measurement_unit')
+                .order_by('ingredient__name')
+                .annotate(amount=Sum('amount'))
+            ),
+        }
+
+    def measure(self, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in self.queries().items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{name}: median {statistics.median(timings):.3f} ms'
+                )
+            )
+            self.stdout.write(queryset.explain())
+
+    def handle(self, *args, **options):
+        if options['seed_recipes']:
+            self.seed(options['seed_recipes'], options['seed'])
+        if not Recipe.objects.exists():
+            self.stdout.write(self.style.ERROR('no recipes to measure'))
+            return
+        if options['before_after']:
+            self.switch_indexes(create=False)
+            try:
+                self.measure('without indexes', options['repeat'])
+            finally:
+                self.switch_indexes(create=True)
+            self.measure('with indexes', options['repeat'])
+        else:
+            self.measure('current schema', options['repeat'])
@@ -0,0 +1,472 @@
+import io
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from PIL import Image, ImageDraw
+
+from recipes.counters import expected_count
+from recipes.images import build_variants
+from recipes.management.commands.recount_counters import COUNTERS
+from recipes.models import (
+    Favorites,
+    Ingredient,
+    ProductsInRecipe,
+    Recipe,
+    ShoppingList,
+    Subscription,
+    Tag,
+)
+from recipes.versions import bump_version
+from users.models import User
+
+PLACEHOLDER_IMAGE = 'recipes/images/generated.jpg'
+PASSWORD = 'generated-password'
+DISHES = (
+    'борщ', 'суп', 'салат', 'пирог', 'котлеты', 'запеканка', 'каша',
+    'рагу', 'плов', 'блины', 'омлет', 'паста', 'пицца', 'жаркое', 'соус',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'праздничный', 'летний', 'постный', 'острый',
+    'сырный', 'грибной', 'куриный', 'рыбный', 'овощной', 'бабушкин',
+)
+WORDS = (
+    'нарезать', 'обжарить', 'тушить', 'запекать', 'варить', 'перемешать',
+    'посолить', 'добавить', 'остудить', 'подавать', 'морковь', 'лук',
+    'картофель', 'капуста', 'свекла', 'чеснок', 'сметана', 'сыр', 'мука',
+    'яйца', 'молоко', 'масло', 'говядина', 'курица', 'рис', 'гречка',
+    'томаты', 'перец', 'укроп', 'петрушка', 'минут', 'духовке',
+    'сковороде', 'кастрюле', 'огне', 'вкус', 'тесто', 'начинка',
+)
+
+
+def power_law_weights(count, exponent):
+    """Накопленные веса Ципфа: элемент с номером n весит 1 / n^exponent."""
+    return list(
+        accumulate(1 / (rank + 1) ** exponent for rank in range(count))
+    )
+
+
+def split_total(total, cum_weights):
+    """Распределение total по элементам пропорционально весам."""
+    weights = [
+        weight - previous
+        for previous, weight in zip([0, *cum_weights], cum_weights)
+    ]
+    scale = total / cum_weights[-1]
+    counts = [int(weight * scale) for weight in weights]
+    rest = total - sum(counts)
+    by_remainder = sorted(
+        range(len(weights)),
+        key=lambda number: counts[number] - weights[number] * scale,
+    )
+    for number in by_remainder[:rest]:
+        counts[number] += 1
+    return counts
+
+
+def weighted_sample(generator, population, cum_weights, count, exclude=None):
+    """До count разных элементов, выбранных с учетом весов."""
+    chosen = {}
+    for _ in range(10):
+        missing = count - len(chosen)
+        if missing <= 0:
+            break
+        for item in generator.choices(
+            population, cum_weights=cum_weights, k=missing * 2
+        ):
+            if item != exclude:
+                chosen.setdefault(item, None)
+    return list(chosen)[:count]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключение auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    """Команда для генерации большого синтетического набора данных.
+
+    Популярность рецептов, активность пользователей и известность авторов
+    распределены по степенному закону, число ингредиентов в рецепте - по
+    логнормальному, ингредиенты берутся из загруженного справочника. При
+    одном и том же seed и исходной БД данные получаются одинаковыми.
+    """
+
+    help = 'generate a large deterministic synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=10_000)
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=float,
+            default=8,
+            help='median number of ingredients in a recipe',
+        )
+        parser.add_argument('--favorites', type=int, default=100_000)
+        parser.add_argument('--cart-entries', type=int, default=20_000)
+        parser.add_argument('--subscriptions', type=int, default=10_000)
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.0,
+            help='power-law exponent of popularity and activity',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='spread publication dates over this many days',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def report(self, model, before, started):
+        created = model.objects.count() - before
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{model._meta.db_table}: {created} rows in {elapsed:.1f} s '
+            f'({created / elapsed if elapsed else 0:.0f} rows/s)'
+        )
+
+    def insert_objects(self, model, objects, batch_size):
+        """Вставка объектов пакетами, не собирая их все в памяти."""
+        started = time.perf_counter()
+        before = model.objects.count()
+        objects = iter(objects)
+        with transaction.atomic():
+            while True:
+                batch = list(islice(objects, batch_size))
+                if not batch:
+                    break
+                model.objects.bulk_create(batch)
+        self.report(model, before, started)
+
+    def insert_rows(self, model, fields, rows, batch_size):
+        """Вставка кортежей значений многострочными INSERT.
+
+        Для таблиц связей создание объектов моделей заняло бы большую
+        часть времени bulk_create. Повторяющиеся пары пропускаются
+        средствами СУБД.
+        """
+        started = time.perf_counter()
+        before = model.objects.count()
+        fields = [model._meta.get_field(name) for name in fields]
+        batch_size = min(
+            batch_size,
+            connection.ops.bulk_batch_size(fields, [None] * batch_size),
+        )
+        insert = (
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{connection.ops.quote_name(model._meta.db_table)} ('
+            + ', '.join(
+                connection.ops.quote_name(field.column) for field in fields
+            )
+            + ') VALUES '
+        )
+        values = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        suffix = connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True
+        )
+        rows = iter(rows)
+        with transaction.atomic(), connection.cursor() as cursor:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                cursor.execute(
+                    f'{insert}{", ".join([values] * len(batch))} {suffix}',
+                    [value for row in batch for value in row],
+                )
+        self.report(model, before, started)
+
+    def placeholder_image(self):
+        """Одна фотография для всех сгенерированных рецептов."""
+        if not default_storage.exists(PLACEHOLDER_IMAGE):
+            image = Image.new('RGB', (1200, 800), (236, 224, 200))
+            draw = ImageDraw.Draw(image)
+            for step in range(0, 800, 40):
+                draw.rectangle(
+                    (0, step, 1200, step + 20), fill=(226, 108, 45)
+                )
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=80)
+            default_storage.save(
+                PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue())
+            )
+        return PLACEHOLDER_IMAGE
+
+    def ensure_reference_data(self, count, generator):
+        if not Ingredient.objects.exists():
+            call_command('load', stdout=self.stdout)
+        missing = count - Tag.objects.count()
+        if missing <= 0:
+            return
+        colors = set(Tag.objects.values_list('color', flat=True))
+        last_tag = Tag.objects.aggregate(last=Max('pk'))['last'] or 0
+        tags = []
+        for number in range(last_tag + 1, last_tag + 1 + missing):
+            color = f'#{generator.randrange(0x1000000):06x}'
+            while color in colors:
+                color = f'#{generator.randrange(0x1000000):06x}'
+            colors.add(color)
+            tags.append(
+                Tag(name=f'Тег {number}', color=color, slug=f'tag-{number}')
+            )
+        self.insert_objects(Tag, tags, len(tags))
+
+    def generate_users(self, count, batch_size):
+        last_user = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        password = make_password(PASSWORD)
+        self.insert_objects(
+            User,
+            (
+                User(
+                    username=f'generated{number}',
+                    email=f'generated{number}@example.org',
+                    first_name='Пользователь',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(last_user + 1, last_user + 1 + count)
+            ),
+            batch_size,
+        )
+        return list(
+            User.objects.filter(pk__gt=last_user)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def generate_recipes(self, count, users, options, generator):
+        last_recipe = Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        authors = power_law_weights(len(users), options['exponent'])
+        image = self.placeholder_image()
+        now = timezone.now()
+        span = timedelta(days=options['days'])
+        with explicit_dates(Recipe._meta.get_field('pub_date')):
+            self.insert_objects(
+                Recipe,
+                (
+                    Recipe(
+                        author_id=author,
+                        name=(
+                            f'{generator.choice(DISHES).capitalize()} '
+                            f'{generator.choice(ADJECTIVES)} '
+                            f'№{last_recipe + number + 1}'
+                        ),
+                        image=image,
+                        text=' '.join(
+                            generator.choices(
+                                WORDS, k=generator.randint(20, 60)
+                            )
+                        ),
+                        cooking_time=generator.randint(5, 180),
+                        pub_date=now
+                        - span * (1 - (number + generator.random()) / count),
+                    )
+                    for number, author in enumerate(
+                        generator.choices(users, cum_weights=authors, k=count)
+                    )
+                ),
+                options['batch_size'],
+            )
+        recipes = list(
+            Recipe.objects.filter(pk__gt=last_recipe)
+            .order_by('pk')
+            .values_list('pk', 'pub_date')
+        )
+        if recipes:
+            self.share_image_variants(image, recipes[0][0], last_recipe)
+        return recipes
+
+    def share_image_variants(self, image, first_recipe, last_recipe):
+        """Копии фотографии строятся один раз и переиспользуются."""
+        variants = (
+            Recipe.objects.filter(image=image, pk__lte=last_recipe)
+            .exclude(image_variants={})
+            .values_list('image_variants', flat=True)
+            .first()
+        )
+        if variants is None:
+            build_variants(first_recipe)
+            variants = Recipe.objects.get(pk=first_recipe).image_variants
+        Recipe.objects.filter(pk__gt=last_recipe).update(
+            image_variants=variants
+        )
+
+    def generate_products(self, recipes, options, generator):
+        ingredients = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        generator.shuffle(ingredients)
+        weights = power_law_weights(len(ingredients), options['exponent'])
+        median = math.log(options['ingredients_per_recipe'])
+        self.insert_rows(
+            ProductsInRecipe,
+            ('recipe', 'ingredient', 'amount'),
+            (
+                (
+                    recipe,
+                    ingredient,
+                    generator.choice((1, 2, 5, 10, 50, 100, 200)),
+                )
+                for recipe, _ in recipes
+                for ingredient in weighted_sample(
+                    generator,
+                    ingredients,
+                    weights,
+                    min(
+                        len(ingredients),
+                        30,
+                        max(
+                            1,
+                            round(generator.lognormvariate(median, 0.4)),
+                        ),
+                    ),
+                )
+            ),
+            options['batch_size'],
+        )
+
+    def generate_tags(self, recipes, options, generator):
+        tags = list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+        weights = power_law_weights(len(tags), options['exponent'])
+        self.insert_rows(
+            Recipe.tags.through,
+            ('recipe', 'tag'),
+            (
+                (recipe, tag)
+                for recipe, _ in recipes
+                for tag in weighted_sample(
+                    generator, tags, weights, generator.randint(1, 3)
+                )
+            ),
+            options['batch_size'],
+        )
+
+    def generate_user_recipes(
+        self, model, total, users, recipes, options, generator
+    ):
+        """Избранное или список покупок: активные пользователи и хиты."""
+        popular = list(recipes)
+        generator.shuffle(popular)
+        weights = power_law_weights(len(popular), options['exponent'])
+        activity = split_total(
+            total, power_law_weights(len(users), options['exponent'])
+        )
+        now = timezone.now()
+        self.insert_rows(
+            model,
+            ('user', 'recipe', 'created'),
+            (
+                (
+                    user,
+                    recipe,
+                    connection.ops.adapt_datetimefield_value(
+                        pub_date + (now - pub_date) * generator.random()
+                    ),
+                )
+                for user, count in zip(users, activity)
+                for recipe, pub_date in weighted_sample(
+                    generator,
+                    popular,
+                    weights,
+                    min(count, len(popular) // 2 or 1),
+                )
+            ),
+            options['batch_size'],
+        )
+
+    def generate_subscriptions(self, total, users, options, generator):
+        weights = power_law_weights(len(users), options['exponent'])
+        activity = split_total(total, weights)
+        self.insert_rows(
+            Subscription,
+            ('user', 'author'),
+            (
+                (user, author)
+                for user, count in zip(users, activity)
+                for author in weighted_sample(
+                    generator,
+                    users,
+                    weights,
+                    min(count, len(users) - 1),
+                    exclude=user,
+                )
+            ),
+            options['batch_size'],
+        )
+
+    def update_derived_data(self):
+        """Счетчики, суммы списков покупок и популярность рецептов."""
+        with transaction.atomic():
+            for model, field, related_model, related_field in COUNTERS:
+                model.objects.update(
+                    **{field: expected_count(related_model, related_field)}
+                )
+        call_command('reconcile_shopping_lists', stdout=io.StringIO())
+        call_command('update_recipe_scores', stdout=self.stdout)
+        for name in ('recipes', 'tags', 'ingredients', 'pantry'):
+            bump_version(name)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        generator = random.Random(options['seed'])
+        self.ensure_reference_data(options['tags'], generator)
+        users = self.generate_users(
+            max(2, options['users']), options['batch_size']
+        )
+        recipes = self.generate_recipes(
+            options['recipes'], users, options, generator
+        )
+        if recipes:
+            self.generate_products(recipes, options, generator)
+            self.generate_tags(recipes, options, generator)
+            self.generate_user_recipes(
+                Favorites,
+                options['favorites'],
+                users,
+                recipes,
+                options,
+                generator,
+            )
+            self.generate_user_recipes(
+                ShoppingList,
+                options['cart_entries'],
+                users,
+                recipes,
+                options,
+                generator,
+            )
+        self.generate_subscriptions(
+            options['subscriptions'], users, options, generator
+        )
+        self.update_derived_data()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'data generated in {time.perf_counter() - started:.1f} s'
+            )
+        )
@@ -1,31 +1,152 @@
 import csv
+import io
+import json
 import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
 from foodgram_backend.settings import BASE_DIR
-from recipes.models import Ingredient
+from recipes.models import Ingredient, Tag
+from recipes.versions import bump_on_commit
+
+
+def read_rows(path, fields):
+    """Чтение строк справочника из csv или json файла."""
+    with open(path, encoding='UTF-8') as file_data:
+        if path.endswith('.json'):
+            return [
+                tuple(item[field] for field in fields)
+                for item in json.load(file_data)
+            ]
+        if path.endswith('.csv'):
+            return [tuple(row) for row in csv.reader(file_data) if row]
+    raise CommandError(f'unsupported file format: {path}')
 
 
 class Command(BaseCommand):
-    """Команда для загрузки ингредиентов из csv файла."""
+    """Команда для загрузки справочных данных в БД."""
 
-    help = "loading data into db from scv file"
+    help = 'loading ingredients, tags and fixtures into db'
 
-    def handle(self, *args, **options):
-        with open(
-            os.path.join(BASE_DIR, 'data', 'ingredients.csv'),
-            encoding='UTF-8',
-        ) as file_data:
-            reader = csv.reader(file_data)
-            for row in reader:
-                name = row[0]
-                measurement_unit = row[1]
-                ingredient = Ingredient(
-                    name=name,
-                    measurement_unit=measurement_unit,
-                )
-                ingredient.save()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(BASE_DIR, 'data', 'ingredients.csv'),
+            help='csv or json file with ingredients',
+        )
+        parser.add_argument(
+            '--tags',
+            default=os.path.join(BASE_DIR, 'data', 'tags.json'),
+            help='csv or json file with tags',
+        )
+        parser.add_argument(
+            '--fixtures',
+            nargs='*',
+            default=[],
+            help='fixtures to load with loaddata after reference data',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='do not use COPY on PostgreSQL',
+        )
+
+    def report(self, name, count, started):
+        elapsed = time.perf_counter() - started
         self.stdout.write(
-            self.style.SUCCESS('ingredient data uploaded successfully')
+            self.style.SUCCESS(
+                f'{name}: {count} new rows in {elapsed:.2f} s '
+                f'({count / elapsed if elapsed else 0:.0f} rows/s)'
+            )
+        )
+
+    def copy_ingredients(self, rows):
+        """Быстрая загрузка ингредиентов через COPY в PostgreSQL.
+
+        COPY не умеет пропускать конфликты, поэтому строки копируются во
+        временную таблицу и переносятся из нее с ON CONFLICT DO NOTHING.
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_load '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_load (name, measurement_unit) '
+                'FROM STDIN WITH CSV',
+                buffer,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT name, measurement_unit FROM ingredient_load '
+                'ON CONFLICT DO NOTHING'
+            )
+            return cursor.rowcount
+
+    @transaction.atomic
+    def load_ingredients(self, path, batch_size, use_copy):
+        """Загрузка ингредиентов, уже существующие пропускаются БД."""
+        started = time.perf_counter()
+        rows = list(
+            dict.fromkeys(read_rows(path, ('name', 'measurement_unit')))
+        )
+        if use_copy and connection.vendor == 'postgresql':
+            created = self.copy_ingredients(rows)
+        else:
+            count = Ingredient.objects.count()
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in rows
+                ),
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            created = Ingredient.objects.count() - count
+        if created:
+            bump_on_commit('ingredients')
+        self.report('ingredients', created, started)
+
+    @transaction.atomic
+    def load_tags(self, path, batch_size):
+        """Загрузка тегов.
+
+        Теги, совпадающие с существующими по названию, цвету или slug,
+        пропускаются БД.
+        """
+        started = time.perf_counter()
+        count = Tag.objects.count()
+        Tag.objects.bulk_create(
+            (
+                Tag(name=name, color=color.lower(), slug=slug)
+                for name, color, slug in read_rows(
+                    path, ('name', 'color', 'slug')
+                )
+            ),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        created = Tag.objects.count() - count
+        if created:
+            bump_on_commit('tags', 'recipes')
+        self.report('tags', created, started)
+
+    def handle(self, *args, **options):
+        self.load_ingredients(
+            options['ingredients'],
+            options['batch_size'],
+            not options['no_copy'],
         )
+        if os.path.exists(options['tags']):
+            self.load_tags(options['tags'], options['batch_size'])
+        if options['fixtures']:
+            call_command('loaddata', *options['fixtures'])
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import ProductsInRecipe, ShoppingListTotal
+
+
+class Command(BaseCommand):
+    """Команда для пересборки сумм ингредиентов в списках покупок."""
+
+    help = 'rebuild shopping list totals and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='only report drift without rebuilding',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in (
+                    ProductsInRecipe.objects.filter(
+                        recipe__shoppinglists__isnull=False,
+                    )
+                    .values_list(
+                        'recipe__shoppinglists__user',
+                        'ingredient',
+                    )
+                    .order_by()
+                    .annotate(amount=Sum('amount'))
+                    .iterator()
+                )
+            }
+            actual = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in (
+                    ShoppingListTotal.objects.values_list(
+                        'user_id',
+                        'ingredient_id',
+                        'amount',
+                    ).iterator()
+                )
+            }
+            drift = {
+                key
+                for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            }
+            for user_id, ingredient_id in sorted(drift):
+                self.stdout.write(
+                    f'user {user_id}, ingredient {ingredient_id}: '
+                    f'expected {expected.get((user_id, ingredient_id))}, '
+                    f'found {actual.get((user_id, ingredient_id))}'
+                )
+            if not options['check']:
+                ShoppingListTotal.objects.all().delete()
+                ShoppingListTotal.objects.bulk_create(
+                    (
+                        ShoppingListTotal(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        )
+                        for (user_id, ingredient_id), amount
+                        in expected.items()
+                    ),
+                    batch_size=1000,
+                )
+        style = self.style.WARNING if drift else self.style.SUCCESS
+        self.stdout.write(
+            style(
+                f'shopping list totals: {len(expected)} rows, '
+                f'{len(drift)} with drift'
+            )
+        )
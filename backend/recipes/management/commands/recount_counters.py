@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import expected_count
+from recipes.models import Favorites, Recipe, ShoppingList, Subscription
+from recipes.versions import bump_on_commit
+from users.models import User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorites, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingList, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+
+class Command(BaseCommand):
+    """Команда для пересчета счетчиков рецептов и пользователей."""
+
+    help = 'recompute denormalized counters and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='only report drift without repairing',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        with transaction.atomic():
+            for model, field, related_model, related_field in COUNTERS:
+                expected = expected_count(related_model, related_field)
+                drift = list(
+                    model.objects.annotate(expected=expected)
+                    .exclude(**{field: F('expected')})
+                    .order_by('pk')
+                    .values_list('pk', field, 'expected')
+                )
+                for pk, stored, actual in drift:
+                    self.stdout.write(
+                        f'{model._meta.model_name} {pk}, {field}: '
+                        f'expected {actual}, found {stored}'
+                    )
+                if drift and not options['check']:
+                    model.objects.filter(
+                        pk__in=[pk for pk, _, _ in drift]
+                    ).update(**{field: expected})
+                total += len(drift)
+            if total and not options['check']:
+                bump_on_commit('recipes')
+        style = self.style.WARNING if total else self.style.SUCCESS
+        self.stdout.write(style(f'counters: {total} rows with drift'))
@@ -0,0 +1,103 @@
+import math
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from foodgram_backend import settings
+from recipes.models import Favorites, Recipe, ShoppingList
+from recipes.versions import bump_on_commit
+
+
+class Command(BaseCommand):
+    """Команда для пересчета популярности рецептов.
+
+    Запускается периодически (например, из cron раз в 10 минут), чтобы
+    лента с сортировкой popular и trending читала готовые значения из
+    индексированных столбцов.
+
+    Затухание trending отсчитывается не от текущего момента, а от
+    RECIPE_TRENDING_EPOCH: вклад добавления растет вдвое за каждый период
+    полураспада после эпохи. Порядок рецептов при этом тот же, что и у
+    суммы с затуханием от текущего момента, но значение рецепта меняется
+    только при его новых добавлениях, а не при каждом запуске.
+    """
+
+    help = 'recompute popular and trending scores of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life-hours',
+            type=float,
+            default=settings.RECIPE_TRENDING_HALF_LIFE_HOURS,
+        )
+
+    def update_popular(self):
+        """Популярность за все время по счетчикам рецепта."""
+        weights = settings.RECIPE_SCORE_WEIGHTS
+        score = (
+            F('favorites_count') * weights['favorites']
+            + F('in_carts_count') * weights['shoppinglists']
+        )
+        return (
+            Recipe.objects.annotate(score=score)
+            .exclude(popular_score=F('score'))
+            .update(popular_score=score)
+        )
+
+    def trending_scores(self, half_life_hours):
+        """Логарифм суммы добавлений с ростом от эпохи.
+
+        Слагаемое weight * 2 ** (часы от эпохи / период) переполняет
+        float через несколько лет, поэтому хранится log2 суммы, которая
+        считается через максимум слагаемых.
+        """
+        epoch = settings.RECIPE_TRENDING_EPOCH
+        exponents = defaultdict(list)
+        for model in (Favorites, ShoppingList):
+            weight = math.log2(
+                settings.RECIPE_SCORE_WEIGHTS[model._meta.default_related_name]
+            )
+            additions = (
+                model.objects.values_list('recipe_id', 'created')
+                .order_by()
+                .iterator()
+            )
+            for recipe_id, created in additions:
+                hours = (created - epoch).total_seconds() / 3600
+                exponents[recipe_id].append(weight + hours / half_life_hours)
+        scores = {}
+        for recipe_id, values in exponents.items():
+            top = max(values)
+            total = math.fsum(2 ** (value - top) for value in values)
+            scores[recipe_id] = round(top + math.log2(total), 9)
+        return scores
+
+    def update_trending(self, scores):
+        """Запись изменившихся значений, остальным рецептам - ноль."""
+        recipes = [
+            Recipe(pk=pk, trending_score=scores.get(pk, 0))
+            for pk, current in Recipe.objects.filter(
+                Q(pk__in=scores) | ~Q(trending_score=0)
+            ).values_list('pk', 'trending_score')
+            if scores.get(pk, 0) != current
+        ]
+        Recipe.objects.bulk_update(
+            recipes, ['trending_score'], batch_size=1000
+        )
+        return len(recipes)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            popular = self.update_popular()
+            trending = self.update_trending(
+                self.trending_scores(options['half_life_hours'])
+            )
+            if popular or trending:
+                bump_on_commit('recipes')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'scores updated: popular {popular}, trending {trending}'
+            )
+        )
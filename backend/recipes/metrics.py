@@ -0,0 +1,309 @@
+import atexit
+import fcntl
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from foodgram_backend import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7)
+ARCHIVE_FILE = 'archive.json'
+
+
+def escape(value):
+    """Экранирование значения метки для текстового формата Prometheus."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels
+    ) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if value % 1 else str(int(value))
+
+
+def read_samples(path):
+    try:
+        with open(path, encoding='UTF-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def write_samples(path, data):
+    with open(f'{path}.tmp', 'w', encoding='UTF-8') as file:
+        json.dump(data, file)
+    os.replace(f'{path}.tmp', path)
+
+
+def to_rows(samples):
+    return [
+        [name, labels, values] for (name, labels), values in samples.items()
+    ]
+
+
+def merge_samples(merged, data):
+    for name, labels, values in data:
+        key = (name, tuple(tuple(label) for label in labels))
+        current = merged.setdefault(key, [0] * len(values))
+        for position, value in enumerate(values):
+            current[position] += value
+    return merged
+
+
+def worker_path(pid):
+    return os.path.join(settings.METRICS_DIR, f'metrics_{pid}.json')
+
+
+def archive_worker(pid):
+    """Перенос значений завершившегося процесса в общий архив.
+
+    Файл процесса удаляется, поэтому каталог не растет при перезапуске
+    воркеров, а новый процесс с тем же pid не затирает старые значения.
+    """
+    if not settings.METRICS_DIR:
+        return
+    path = worker_path(pid)
+    if not os.path.exists(path):
+        return
+    archive = os.path.join(settings.METRICS_DIR, ARCHIVE_FILE)
+    with archive_lock(fcntl.LOCK_EX):
+        merged = merge_samples({}, read_samples(archive))
+        merge_samples(merged, read_samples(path))
+        write_samples(archive, to_rows(merged))
+        os.remove(path)
+
+
+@contextmanager
+def archive_lock(operation):
+    """Блокировка архива между процессами на время его изменения."""
+    path = os.path.join(settings.METRICS_DIR, f'{ARCHIVE_FILE}.lock')
+    with open(path, 'w') as lock:
+        fcntl.flock(lock, operation)
+        yield
+
+
+def clear_directory():
+    """Очистка каталога метрик при запуске мастера gunicorn."""
+    if not settings.METRICS_DIR:
+        return
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json*')):
+        os.remove(path)
+
+
+class Registry:
+    """Метрики процесса с объединением между воркерами через каталог.
+
+    Значения копятся в памяти процесса под блокировкой. Если задан
+    METRICS_DIR, каждый процесс не чаще раза в METRICS_FLUSH_INTERVAL
+    секунд записывает свои значения в отдельный файл, а при выдаче
+    метрик суммируются файлы всех процессов и архив завершившихся.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.flushed = 0.0
+        self.owned = False
+
+    def reset(self):
+        """Сброс значений в дочернем процессе после fork."""
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.flushed = 0.0
+        self.owned = False
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add(self, name, labels, values):
+        key = (name, labels)
+        with self.lock:
+            current = self.samples.get(key)
+            if current is None:
+                self.samples[key] = list(values)
+            else:
+                for position, value in enumerate(values):
+                    current[position] += value
+
+    def flush(self):
+        """Запись значений процесса в его файл в общем каталоге."""
+        if not settings.METRICS_DIR:
+            return
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        if not self.owned:
+            # Файл с тем же pid остался от завершившегося процесса.
+            archive_worker(os.getpid())
+            self.owned = True
+        with self.lock:
+            data = to_rows(self.samples)
+            self.flushed = time.monotonic()
+        write_samples(worker_path(os.getpid()), data)
+
+    def maybe_flush(self):
+        if (
+            settings.METRICS_DIR
+            and time.monotonic() - self.flushed
+            >= settings.METRICS_FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def collect(self):
+        """Суммарные значения всех процессов или только текущего."""
+        if not settings.METRICS_DIR:
+            with self.lock:
+                return {
+                    key: list(values) for key, values in self.samples.items()
+                }
+        self.flush()
+        merged = {}
+        with archive_lock(fcntl.LOCK_SH):
+            for path in glob.glob(
+                os.path.join(settings.METRICS_DIR, 'metrics_*.json')
+            ):
+                merge_samples(merged, read_samples(path))
+            return merge_samples(
+                merged,
+                read_samples(
+                    os.path.join(settings.METRICS_DIR, ARCHIVE_FILE)
+                ),
+            )
+
+    def render(self):
+        """Текстовый формат Prometheus 0.0.4."""
+        samples = self.collect()
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for (sample_name, labels), values in sorted(samples.items()):
+                if sample_name == name:
+                    lines.extend(metric.render(labels, values))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+os.register_at_fork(after_in_child=registry.reset)
+
+
+class Counter:
+    """Монотонный счетчик."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        registry.register(self)
+
+    def labels(self, values):
+        return tuple(zip(self.labelnames, map(str, values)))
+
+    def inc(self, *labels, amount=1):
+        registry.add(self.name, self.labels(labels), (amount,))
+
+    def render(self, labels, values):
+        return [f'{self.name}{format_labels(labels)} {values[0]}']
+
+
+class Histogram(Counter):
+    """Гистограмма с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*buckets, math.inf)
+
+    def observe(self, value, *labels):
+        values = [0] * (len(self.buckets) + 1)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                values[position] = 1
+                break
+        values[-1] = value
+        registry.add(self.name, self.labels(labels), values)
+
+    def render(self, labels, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, values):
+            cumulative += count
+            lines.append(
+                f'{self.name}_bucket'
+                f'{format_labels((*labels, ("le", format_value(bound))))} '
+                f'{cumulative}'
+            )
+        lines.append(f'{self.name}_sum{format_labels(labels)} {values[-1]}')
+        lines.append(f'{self.name}_count{format_labels(labels)} {cumulative}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Request latency by DRF route name, method and status.',
+    ('route', 'method', 'status'),
+)
+DB_QUERIES = Histogram(
+    'foodgram_db_queries_per_request',
+    'SQL queries per request by route.',
+    ('route',),
+    COUNT_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'foodgram_db_duration_seconds',
+    'Total SQL time per request by route.',
+    ('route',),
+)
+EXPORT_DURATION = Histogram(
+    'foodgram_shopping_cart_export_duration_seconds',
+    'Shopping cart export generation time by format.',
+    ('format',),
+)
+EXPORT_SIZE = Histogram(
+    'foodgram_shopping_cart_export_bytes',
+    'Shopping cart export size by format.',
+    ('format',),
+    SIZE_BUCKETS,
+)
+IMAGE_DECODE_DURATION = Histogram(
+    'foodgram_image_decode_duration_seconds',
+    'Recipe image decode time: upload checks and variant builds.',
+    ('stage',),
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Cache lookups by cache name and result.',
+    ('cache', 'result'),
+)
+
+
+def cache_lookup(name, hit):
+    """Учет попадания или промаха кеша."""
+    CACHE_REQUESTS.inc(name, 'hit' if hit else 'miss')
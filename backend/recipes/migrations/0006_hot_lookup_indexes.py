@@ -0,0 +1,62 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+UPPER_NAME_INDEX = {
+    'postgresql': (
+        'CREATE INDEX IF NOT EXISTS ingredient_upper_name_idx '
+        'ON recipes_ingredient (UPPER(name) varchar_pattern_ops)'
+    ),
+    'sqlite': (
+        'CREATE INDEX IF NOT EXISTS ingredient_upper_name_idx '
+        'ON recipes_ingredient (name COLLATE NOCASE)'
+    ),
+}
+
+
+def create_upper_name_index(apps, schema_editor):
+    """Индекс для поиска ингредиентов по name__istartswith."""
+    sql = UPPER_NAME_INDEX.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_upper_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor in UPPER_NAME_INDEX:
+        schema_editor.execute('DROP INDEX IF EXISTS ingredient_upper_name_idx')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0005_uploadedimage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(
+                fields=['recipe', 'user'],
+                name='shoppinglist_recipe_user_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='favorites',
+            index=models.Index(
+                fields=['recipe', 'user'], name='favorites_recipe_user_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(
+                fields=['author', 'user'],
+                name='subscription_author_user_idx',
+            ),
+        ),
+        migrations.RunPython(create_upper_name_index, drop_upper_name_index),
+    ]
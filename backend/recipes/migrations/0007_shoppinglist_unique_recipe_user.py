@@ -0,0 +1,31 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:00
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicates(apps, schema_editor):
+    """Удаление повторов рецептов в списках покупок перед ограничением."""
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    first_ids = (
+        ShoppingList.objects.values('user', 'recipe')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    ShoppingList.objects.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0006_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_recipe_user'
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Recipe', 'favorites_count', 'Favorites', 'recipe'),
+    ('recipes', 'Recipe', 'in_carts_count', 'ShoppingList', 'recipe'),
+    ('users', 'User', 'recipes_count', 'Recipe', 'author'),
+    ('users', 'User', 'subscribers_count', 'Subscription', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    """Заполнение счетчиков по существующим данным."""
+    for app_label, model_name, field, related_name, related_field in COUNTERS:
+        related_model = apps.get_model('recipes', related_name)
+        apps.get_model(app_label, model_name).objects.update(
+            **{
+                field: Coalesce(
+                    Subquery(
+                        related_model.objects.filter(
+                            **{related_field: OuterRef('pk')}
+                        )
+                        .order_by()
+                        .values(related_field)
+                        .annotate(count=Count('pk'))
+                        .values('count')
+                    ),
+                    0,
+                )
+            }
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('users', '0002_user_counters'),
+        ('recipes', '0007_shoppinglist_unique_recipe_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name='добавлений в избранное',
+            ),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name='добавлений в списки покупок',
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_created(apps, schema_editor):
+    """Дата добавления старых записей неизвестна, берем дату рецепта.
+
+    Так старые добавления не попадают в популярное за последнее время.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model_name in ('Favorites', 'ShoppingList'):
+        apps.get_model('recipes', model_name).objects.update(
+            created=Subquery(
+                Recipe.objects.filter(pk=OuterRef('recipe')).values(
+                    'pub_date'
+                )
+            )
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0008_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorites',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name='дата и время добавления',
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name='дата и время добавления',
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='recipe',
+            name='popular_score',
+            field=models.FloatField(
+                default=0, editable=False, verbose_name='популярность'
+            ),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(
+                default=0,
+                editable=False,
+                verbose_name='популярность за последнее время',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['-popular_score', '-pub_date', '-id'],
+                name='recipe_popular_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['-trending_score', '-pub_date', '-id'],
+                name='recipe_trending_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.3 on 2026-10-18 22:00
+
+from django.db import migrations
+
+from recipes.search import SEARCH_ENGINES
+
+
+def install_search(apps, schema_editor):
+    """Столбец или таблица полнотекстового поиска с триггерами."""
+    engine = SEARCH_ENGINES.get(schema_editor.connection.vendor)
+    if engine:
+        engine().install(schema_editor)
+
+
+def uninstall_search(apps, schema_editor):
+    engine = SEARCH_ENGINES.get(schema_editor.connection.vendor)
+    if engine:
+        engine().uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0009_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
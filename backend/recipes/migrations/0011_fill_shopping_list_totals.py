@@ -0,0 +1,44 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:00
+
+from django.db import migrations
+from django.db.models import Sum
+
+BATCH_SIZE = 5000
+
+
+def fill_shopping_list_totals(apps, schema_editor):
+    """Заполнение сумм ингредиентов по существующим спискам покупок."""
+    ProductsInRecipe = apps.get_model('recipes', 'ProductsInRecipe')
+    ShoppingListTotal = apps.get_model('recipes', 'ShoppingListTotal')
+    ShoppingListTotal.objects.all().delete()
+    totals = (
+        ProductsInRecipe.objects.filter(
+            recipe__shoppinglists__isnull=False,
+        )
+        .values_list('recipe__shoppinglists__user', 'ingredient')
+        .order_by()
+        .annotate(amount=Sum('amount'))
+    )
+    ShoppingListTotal.objects.bulk_create(
+        (
+            ShoppingListTotal(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                amount=amount,
+            )
+            for user_id, ingredient_id, amount in totals.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0010_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_shopping_list_totals, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.3 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0011_fill_shopping_list_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                (
+                    'name',
+                    models.CharField(
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='набор данных',
+                    ),
+                ),
+                (
+                    'version',
+                    models.BigIntegerField(default=0, verbose_name='версия'),
+                ),
+                (
+                    'modified',
+                    models.DateTimeField(
+                        null=True, verbose_name='время изменения'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'версия данных',
+                'verbose_name_plural': 'версии данных',
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.3 on 2026-10-19 00:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_rows(model, field, keep_id, duplicate_ids):
+    """Перенос строк на оставляемый ингредиент со сложением количеств."""
+    kept = {
+        getattr(row, field): row
+        for row in model.objects.filter(ingredient_id=keep_id)
+    }
+    for row in model.objects.filter(ingredient_id__in=duplicate_ids):
+        owner = getattr(row, field)
+        if owner in kept:
+            kept[owner].amount += row.amount
+            kept[owner].save(update_fields=['amount'])
+            row.delete()
+        else:
+            row.ingredient_id = keep_id
+            row.save(update_fields=['ingredient'])
+            kept[owner] = row
+
+
+def merge_duplicates(apps, schema_editor):
+    """Объединение ингредиентов с одинаковыми названием и единицей."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    ProductsInRecipe = apps.get_model('recipes', 'ProductsInRecipe')
+    ShoppingListTotal = apps.get_model('recipes', 'ShoppingListTotal')
+    duplicates = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep_id=Min('id'), count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for group in duplicates:
+        duplicate_ids = list(
+            Ingredient.objects.filter(
+                name=group['name'],
+                measurement_unit=group['measurement_unit'],
+            )
+            .exclude(id=group['keep_id'])
+            .values_list('id', flat=True)
+        )
+        merge_rows(
+            ProductsInRecipe, 'recipe_id', group['keep_id'], duplicate_ids
+        )
+        merge_rows(
+            ShoppingListTotal, 'user_id', group['keep_id'], duplicate_ids
+        )
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0012_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_unit',
+            ),
+        ),
+    ]
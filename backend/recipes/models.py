@@ -1,8 +1,24 @@
 from django.core import validators
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
 from foodgram_backend import settings
+from recipes.counters import DerivedFieldsMixin, change_counter
+from recipes.versions import bump_on_commit, user_version_name
 from users.models import User
 
 
@@ -70,6 +86,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'ингредиент'
         verbose_name_plural = 'ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit',
+            )
+        ]
 
     def __str__(self) -> str:
         return (
@@ -78,9 +100,80 @@ class Ingredient(models.Model):
         )
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам."""
+
+    def with_related(self):
+        """Подгрузка автора, тегов и ингредиентов рецептов."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'productsinrecipe_recipe',
+                queryset=ProductsInRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('pk'),
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """Аннотация избранного, списка покупок и подписки на автора."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, models.BooleanField()),
+                is_in_shopping_cart=Value(False, models.BooleanField()),
+                is_subscribed_to_author=Value(False, models.BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorites.objects.filter(recipe=OuterRef('pk'), user=user)
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingList.objects.filter(recipe=OuterRef('pk'), user=user)
+            ),
+            is_subscribed_to_author=Exists(
+                Subscription.objects.filter(
+                    author=OuterRef('author'), user=user
+                )
+            ),
+        )
+
+    def latest_for_authors(self, author_ids, limit):
+        """Последние рецепты каждого автора, не больше limit на автора."""
+        if not author_ids:
+            return self.none()
+        ranked = (
+            Recipe.objects.filter(author__in=author_ids)
+            .annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=[F('author')],
+                    order_by=[F('pub_date').desc(), F('pk').desc()],
+                )
+            )
+            .order_by()
+            .values('pk', 'row_number')
+        )
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(
+            pk__in=RawSQL(
+                f'SELECT ranked.id FROM ({sql}) ranked '
+                'WHERE ranked.row_number <= %s',
+                (*params, limit),
+            )
+        )
+
+
+class Recipe(DerivedFieldsMixin, models.Model):
     """Модель для работы с рецептами."""
 
+    derived_fields = (
+        'image_variants',
+        'favorites_count',
+        'in_carts_count',
+        'popular_score',
+        'trending_score',
+    )
+
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -124,16 +217,84 @@ class Recipe(models.Model):
         'дата и время публикации рецепта',
         auto_now_add=True,
     )
+    image_variants = models.JSONField(
+        'уменьшенные копии фотографии',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'добавлений в списки покупок',
+        default=0,
+        editable=False,
+    )
+    popular_score = models.FloatField(
+        'популярность',
+        default=0,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        'популярность за последнее время',
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['-popular_score', '-pub_date', '-id'],
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', '-pub_date', '-id'],
+                name='recipe_trending_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name[: settings.SHOW_CHARACTERS]
 
 
+class UploadedImage(models.Model):
+    """Модель для фотографий, загруженных до создания рецепта."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='пользователь',
+        related_name='uploaded_images',
+    )
+    image = models.ImageField(
+        'фотография',
+        upload_to='recipes/images/',
+    )
+    created = models.DateTimeField(
+        'дата и время загрузки',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = 'загруженная фотография'
+        verbose_name_plural = 'загруженные фотографии'
+
+    def __str__(self) -> str:
+        return self.image.name
+
+
 class ProductsInRecipe(models.Model):
     """Модель для работы с ингредиентами в рецепте."""
 
@@ -177,6 +338,96 @@ class ProductsInRecipe(models.Model):
         return f'Рецепт: {self.recipe.name[: settings.SHOW_CHARACTERS]}'
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """Запросы к избранному и спискам покупок."""
+
+    def _run(self, sql, params):
+        """Выполнение запроса и получение id затронутых рецептов."""
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [recipe_id for recipe_id, in cursor.fetchall()]
+
+    @transaction.atomic
+    def add_recipes(self, user, recipes):
+        """Добавление рецептов одним запросом без повторов.
+
+        recipes - список id рецептов или запрос, выбирающий один столбец
+        с id рецептов. Возвращает id действительно добавленных рецептов.
+        """
+        if not isinstance(recipes, models.QuerySet):
+            if not recipes:
+                return []
+            recipes = Recipe.objects.filter(pk__in=recipes).values('pk')
+        sql, params = recipes.order_by().query.sql_with_params()
+        recipe_ids = self._run(
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{self.model._meta.db_table} (user_id, recipe_id, created) '
+            f'SELECT %s, source.*, %s FROM ({sql}) source '
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)} '
+            'RETURNING recipe_id',
+            (
+                user.pk,
+                connection.ops.adapt_datetimefield_value(timezone.now()),
+                *params,
+            ),
+        )
+        self.recipes_changed(user, recipe_ids, added=True)
+        return recipe_ids
+
+    @transaction.atomic
+    def remove_recipes(self, user, recipe_ids=None):
+        """Удаление рецептов одним запросом.
+
+        Без recipe_ids удаляются все рецепты пользователя. Возвращает id
+        действительно удаленных рецептов.
+        """
+        sql = f'DELETE FROM {self.model._meta.db_table} WHERE user_id = %s'
+        params = [user.pk]
+        if recipe_ids is not None:
+            if not recipe_ids:
+                return []
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            sql += f' AND recipe_id IN ({placeholders})'
+            params.extend(recipe_ids)
+        recipe_ids = self._run(f'{sql} RETURNING recipe_id', params)
+        self.recipes_changed(user, recipe_ids, added=False)
+        return recipe_ids
+
+    def recipes_changed(self, user, recipe_ids, added):
+        """Учет изменений, сделанных в обход сигналов моделей."""
+        if recipe_ids:
+            change_counter(
+                Recipe.objects.filter(pk__in=recipe_ids),
+                self.model.recipe_counter,
+                1 if added else -1,
+            )
+            bump_on_commit(user_version_name(user.pk))
+
+
+class ShoppingListQuerySet(UserRecipeQuerySet):
+    """Запросы к спискам покупок."""
+
+    def recipes_changed(self, user, recipe_ids, added):
+        """Пересчет сумм ингредиентов после изменения списка покупок."""
+        super().recipes_changed(user, recipe_ids, added)
+        if not recipe_ids:
+            return
+        sign = 1 if added else -1
+        ShoppingListTotal.objects.add_amounts(
+            [user.pk],
+            {
+                ingredient_id: sign * amount
+                for ingredient_id, amount in ProductsInRecipe.objects.filter(
+                    recipe_id__in=recipe_ids
+                )
+                .order_by()
+                .values('ingredient_id')
+                .annotate(amount=Sum('amount'))
+                .values_list('ingredient_id', 'amount')
+            },
+        )
+
+
 class BaseModelForShoppingListAndFavorites(models.Model):
     """Базовая модель для избранного и списка покупок."""
 
@@ -190,6 +441,13 @@ class BaseModelForShoppingListAndFavorites(models.Model):
         on_delete=models.CASCADE,
         verbose_name='пользователь',
     )
+    created = models.DateTimeField(
+        'дата и время добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         abstract = True
@@ -207,6 +465,9 @@ class BaseModelForShoppingListAndFavorites(models.Model):
 class ShoppingList(BaseModelForShoppingListAndFavorites):
     """Модель для работы со списком покупок."""
 
+    objects = ShoppingListQuerySet.as_manager()
+    recipe_counter = 'in_carts_count'
+
     class Meta:
         verbose_name = 'список покупок'
         verbose_name_plural = 'списки покупок'
@@ -217,11 +478,103 @@ class ShoppingList(BaseModelForShoppingListAndFavorites):
                 name='unique_recipe_user',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='shoppinglist_recipe_user_idx',
+            ),
+        ]
+
+
+class ShoppingListTotalQuerySet(models.QuerySet):
+    """Запросы к суммам ингредиентов в списках покупок."""
+
+    @transaction.atomic
+    def add_amounts(self, user_ids, amounts):
+        """Изменение сумм ингредиентов в списках покупок пользователей.
+
+        amounts - словарь {id ингредиента: изменение количества}.
+        """
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items()
+            if amount
+        }
+        user_ids = sorted(set(user_ids))
+        if not user_ids or not amounts:
+            return
+        list(
+            User.objects.select_for_update()
+            .filter(pk__in=user_ids)
+            .values_list('pk', flat=True)
+        )
+        totals = self.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=amounts,
+        )
+        existing = set(totals.values_list('user_id', 'ingredient_id'))
+        totals.update(
+            amount=F('amount')
+            + Case(
+                *[
+                    When(ingredient_id=ingredient_id, then=Value(amount))
+                    for ingredient_id, amount in amounts.items()
+                ],
+                output_field=models.IntegerField(),
+            )
+        )
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                )
+                for user_id in user_ids
+                for ingredient_id, amount in amounts.items()
+                if amount > 0 and (user_id, ingredient_id) not in existing
+            ]
+        )
+        totals.filter(amount__lte=0).delete()
+
+
+class ShoppingListTotal(models.Model):
+    """Модель для работы с суммой ингредиентов в списке покупок."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='ингредиент',
+    )
+    amount = models.IntegerField('количество ингредиента в списке покупок')
+
+    objects = ShoppingListTotalQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ингредиент в списке покупок'
+        verbose_name_plural = 'ингредиенты в списках покупок'
+        default_related_name = 'shoppinglisttotals'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient',
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.ingredient}: {self.amount}'
 
 
 class Favorites(BaseModelForShoppingListAndFavorites):
     """Модель для работы с избранным."""
 
+    recipe_counter = 'favorites_count'
+
     class Meta:
         verbose_name = 'избранное'
         verbose_name_plural = 'избранные'
@@ -232,6 +585,12 @@ class Favorites(BaseModelForShoppingListAndFavorites):
                 name='unique_user_recipe',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorites_recipe_user_idx',
+            ),
+        ]
 
 
 class Subscription(models.Model):
@@ -258,6 +617,12 @@ class Subscription(models.Model):
                 fields=['user', 'author'], name='unique_user_author'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='subscription_author_user_idx',
+            ),
+        ]
 
     def clean(self):
         if self.user == self.author:
@@ -267,3 +632,22 @@ class Subscription(models.Model):
 
     def __str__(self) -> str:
         return self.author.username[: settings.SHOW_CHARACTERS]
+
+
+class DataVersion(models.Model):
+    """Версия набора данных для ETag, кеша ответов и индексов процесса.
+
+    Хранится в БД, чтобы изменения из management-команд и других
+    процессов сразу видели все воркеры.
+    """
+
+    name = models.CharField('набор данных', max_length=64, primary_key=True)
+    version = models.BigIntegerField('версия', default=0)
+    modified = models.DateTimeField('время изменения', null=True)
+
+    class Meta:
+        verbose_name = 'версия данных'
+        verbose_name_plural = 'версии данных'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.version}'
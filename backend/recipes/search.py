@@ -0,0 +1,178 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from foodgram_backend import settings
+
+
+class PostgresSearchEngine:
+    """Полнотекстовый поиск PostgreSQL с русской морфологией.
+
+    Столбец search_vector заполняется триггером при любой вставке или
+    изменении названия и описания, в том числе при bulk_create и update.
+    """
+
+    install_sql = (
+        'ALTER TABLE recipes_recipe '
+        'ADD COLUMN IF NOT EXISTS search_vector tsvector',
+        'CREATE OR REPLACE FUNCTION recipes_recipe_search_vector() '
+        'RETURNS trigger AS $$ BEGIN '
+        'NEW.search_vector := '
+        "setweight(to_tsvector('{config}', coalesce(NEW.name, '')), 'A') || "
+        "setweight(to_tsvector('{config}', coalesce(NEW.text, '')), 'B'); "
+        'RETURN NEW; END $$ LANGUAGE plpgsql',
+        'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+        'ON recipes_recipe',
+        'CREATE TRIGGER recipes_recipe_search_vector_trigger '
+        'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+        'FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector()',
+        'UPDATE recipes_recipe SET name = name',
+        'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+        'ON recipes_recipe USING gin (search_vector)',
+    )
+    uninstall_sql = (
+        'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+        'ON recipes_recipe',
+        'DROP FUNCTION IF EXISTS recipes_recipe_search_vector()',
+        'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+    )
+
+    def install(self, schema_editor):
+        for sql in self.install_sql:
+            schema_editor.execute(
+                sql.format(config=settings.RECIPE_SEARCH_CONFIG)
+            )
+
+    def uninstall(self, schema_editor):
+        for sql in self.uninstall_sql:
+            schema_editor.execute(sql)
+
+    def search(self, queryset, query):
+        """Рецепты, подходящие под запрос, с релевантностью search_rank.
+
+        ts_rank возвращает real, а значение из курсора передается как
+        double precision, поэтому ранг приводится к double precision,
+        иначе сравнение с курсором теряет рецепты с равным рангом.
+        """
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        params = (settings.RECIPE_SEARCH_CONFIG, query)
+        return queryset.filter(
+            RawSQL(
+                f'recipes_recipe.search_vector @@ {tsquery}',
+                params,
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'ts_rank(recipes_recipe.search_vector, {tsquery})::float8',
+                params,
+                output_field=FloatField(),
+            )
+        )
+
+
+class SQLiteSearchEngine:
+    """Поиск по таблице FTS5 для локальной разработки и тестов.
+
+    Морфологии нет, каждое слово запроса ищется как префикс. Таблица FTS
+    присоединяется к запросу через extra(), потому что bm25() работает
+    только в запросе с MATCH по ней самой. SQLite
+    пересоздает таблицу рецептов при изменении ее схемы и теряет триггеры,
+    поэтому restore вызывается после каждой миграции.
+    """
+
+    triggers = {
+        'recipes_recipe_fts_insert': (
+            'AFTER INSERT ON recipes_recipe BEGIN '
+            'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+            'VALUES (new.id, new.name, new.text); END'
+        ),
+        'recipes_recipe_fts_delete': (
+            'AFTER DELETE ON recipes_recipe BEGIN '
+            'INSERT INTO recipes_recipe_fts'
+            '(recipes_recipe_fts, rowid, name, text) '
+            "VALUES ('delete', old.id, old.name, old.text); END"
+        ),
+        'recipes_recipe_fts_update': (
+            'AFTER UPDATE OF name, text ON recipes_recipe BEGIN '
+            'INSERT INTO recipes_recipe_fts'
+            '(recipes_recipe_fts, rowid, name, text) '
+            "VALUES ('delete', old.id, old.name, old.text); "
+            'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+            'VALUES (new.id, new.name, new.text); END'
+        ),
+    }
+    name_weight = 10.0
+    text_weight = 1.0
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts '
+            "USING fts5(name, text, content='recipes_recipe', "
+            "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        self.restore(schema_editor)
+
+    def restore(self, schema_editor):
+        """Создание недостающих триггеров и перестроение индекса."""
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT type, name FROM sqlite_master WHERE name = "
+                "'recipes_recipe_fts' OR tbl_name = 'recipes_recipe'"
+            )
+            existing = set(cursor.fetchall())
+        if ('table', 'recipes_recipe_fts') not in existing:
+            return
+        if {('trigger', name) for name in self.triggers} <= existing:
+            return
+        for name, body in self.triggers.items():
+            schema_editor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {name} {body}'
+            )
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts(recipes_recipe_fts) '
+            "VALUES ('rebuild')"
+        )
+
+    def uninstall(self, schema_editor):
+        for name in self.triggers:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+    def match_expression(self, query):
+        return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+    def search(self, queryset, query):
+        """Рецепты, подходящие под запрос, с релевантностью search_rank."""
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            ).none()
+        return queryset.extra(
+            tables=['recipes_recipe_fts'],
+            where=[
+                'recipes_recipe_fts.rowid = recipes_recipe.id',
+                'recipes_recipe_fts MATCH %s',
+            ],
+            params=[expression],
+        ).annotate(
+            search_rank=RawSQL(
+                '-bm25(recipes_recipe_fts, %s, %s)',
+                (self.name_weight, self.text_weight),
+                output_field=FloatField(),
+            )
+        )
+
+
+SEARCH_ENGINES = {
+    'postgresql': PostgresSearchEngine,
+    'sqlite': SQLiteSearchEngine,
+}
+
+
+def get_search_engine(vendor=None):
+    """Поисковый движок для текущей или указанной СУБД."""
+    return SEARCH_ENGINES[vendor or connection.vendor]()
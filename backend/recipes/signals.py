@@ -0,0 +1,193 @@
+from django.db import connections, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.images import schedule_variants, variants_are_stale
+from recipes.models import (
+    Favorites,
+    Ingredient,
+    ProductsInRecipe,
+    Recipe,
+    ShoppingList,
+    ShoppingListTotal,
+    Subscription,
+    Tag,
+)
+from recipes.search import SQLiteSearchEngine
+from recipes.versions import bump_on_commit, user_version_name
+from users.models import User
+
+AUTHOR_FIELDS = frozenset(('username', 'email', 'first_name', 'last_name'))
+
+
+def recipe_amounts(recipe_id):
+    """Количество ингредиентов в рецепте в виде {id ингредиента: amount}."""
+    return dict(
+        ProductsInRecipe.objects.filter(recipe=recipe_id)
+        .order_by()
+        .values_list('ingredient_id', 'amount')
+    )
+
+
+@receiver(post_save, sender=ShoppingList)
+def add_to_shopping_list_totals(sender, instance, created, **kwargs):
+    """Учет ингредиентов рецепта, добавленного в список покупок."""
+    if created:
+        ShoppingListTotal.objects.add_amounts(
+            [instance.user_id],
+            recipe_amounts(instance.recipe_id),
+        )
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def remove_from_shopping_list_totals(sender, instance, **kwargs):
+    """Учет ингредиентов рецепта, удаленного из списка покупок."""
+    ShoppingListTotal.objects.add_amounts(
+        [instance.user_id],
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe_amounts(
+                instance.recipe_id
+            ).items()
+        },
+    )
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=ShoppingList)
+def increment_recipe_counter(sender, instance, created, raw, **kwargs):
+    """Учет добавления рецепта в избранное или список покупок."""
+    if created and not raw:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            sender.recipe_counter,
+            1,
+        )
+
+
+@receiver(post_delete, sender=Favorites)
+@receiver(post_delete, sender=ShoppingList)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    """Учет удаления рецепта из избранного или списка покупок."""
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        sender.recipe_counter,
+        -1,
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, raw, **kwargs):
+    """Учет нового рецепта автора."""
+    if created and not raw:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    """Учет удаленного рецепта автора."""
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(sender, instance, created, raw, **kwargs):
+    """Учет нового подписчика автора."""
+    if created and not raw:
+        change_counter(
+            User.objects.filter(pk=instance.author_id),
+            'subscribers_count',
+            1,
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    """Учет отписки от автора."""
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'subscribers_count', -1
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    """Сброс индекса и валидаторов ингредиентов после их изменения."""
+    bump_on_commit('ingredients')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    """Сброс валидаторов тегов и рецептов после изменения тегов."""
+    bump_on_commit('tags', 'recipes')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=ProductsInRecipe)
+@receiver(post_delete, sender=ProductsInRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_delete, sender=User)
+def bump_recipes_version(sender, **kwargs):
+    """Сброс валидаторов рецептов после изменения их данных."""
+    bump_on_commit('recipes')
+
+
+@receiver(post_save, sender=User)
+def bump_recipes_version_for_author(sender, update_fields=None, **kwargs):
+    """Сброс валидаторов рецептов после изменения данных автора.
+
+    Вход пользователя сохраняет только last_login, которого нет в ответах
+    с рецептами, поэтому такие сохранения версию не меняют.
+    """
+    if update_fields is None or not update_fields.isdisjoint(AUTHOR_FIELDS):
+        bump_on_commit('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=ProductsInRecipe)
+@receiver(post_delete, sender=ProductsInRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_pantry_version(sender, **kwargs):
+    """Пересборка обратного индекса после изменения состава рецептов."""
+    bump_on_commit('pantry')
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_delete, sender=Favorites)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def bump_user_version(sender, instance, **kwargs):
+    """Сброс валидаторов с отметками пользователя после их изменения."""
+    bump_on_commit(user_version_name(instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(sender, instance, **kwargs):
+    """Построение копий новой фотографии рецепта вне обработки запроса."""
+    if variants_are_stale(instance):
+        transaction.on_commit(lambda: schedule_variants(instance.pk))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    """Восстановление триггеров поиска после пересоздания таблиц SQLite."""
+    if sender.label == 'recipes' and connections[using].vendor == 'sqlite':
+        with connections[using].schema_editor() as schema_editor:
+            SQLiteSearchEngine().restore(schema_editor)
@@ -0,0 +1,59 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def user_version_name(user_id):
+    """Имя версии отметок пользователя: избранного, покупок и подписок."""
+    return f'user:{user_id}'
+
+
+def data_versions():
+    # Модели импортируют этот модуль, поэтому модель берется при вызове.
+    from recipes.models import DataVersion
+
+    return DataVersion.objects
+
+
+def get_versions(names):
+    """Версии и время изменения наборов данных одним запросом.
+
+    Набор, который еще не менялся, имеет версию 0 и неизвестное время
+    изменения.
+    """
+    rows = dict.fromkeys(names, (0, None))
+    rows.update(
+        (name, (version, modified))
+        for name, version, modified in data_versions()
+        .filter(name__in=names)
+        .values_list('name', 'version', 'modified')
+    )
+    return rows
+
+
+def get_version(name):
+    """Текущая версия набора данных."""
+    return get_versions([name])[name][0]
+
+
+def bump_version(name):
+    """Увеличение версии набора данных после его изменения."""
+    now = timezone.now()
+    versions = data_versions()
+    if versions.filter(name=name).update(
+        version=F('version') + 1, modified=now
+    ):
+        return
+    try:
+        with transaction.atomic():
+            versions.create(name=name, version=1, modified=now)
+    except IntegrityError:
+        versions.filter(name=name).update(
+            version=F('version') + 1, modified=now
+        )
+
+
+def bump_on_commit(*names):
+    """Увеличение версий после фиксации текущей транзакции."""
+    for name in names:
+        transaction.on_commit(lambda name=name: bump_version(name))
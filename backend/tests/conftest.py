@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+import pytest
+from rest_framework.test import APIClient
+
+from api import indexes
+from recipes.models import Ingredient, ProductsInRecipe, Recipe, Tag
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_indexes(monkeypatch):
+    """Индексы процесса не переживают откат транзакции теста."""
+    for name in ('_index', '_recipe_index', '_tag_registry'):
+        monkeypatch.setattr(indexes, name, None)
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        username='cook',
+        email='cook@foodgram.ru',
+        password='password',
+        first_name='Иван',
+        last_name='Поваров',
+    )
+
+
+@pytest.fixture
+def another_user(db):
+    return User.objects.create_user(
+        username='baker',
+        email='baker@foodgram.ru',
+        password='password',
+        first_name='Петр',
+        last_name='Пекарев',
+    )
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(
+            name=f'тег {number}',
+            color=f'#00000{number}',
+            slug=f'tag{number}',
+        )
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('яблоко', 'ежевика', 'сахар', 'соль', 'мука', 'масло')
+    ]
+
+
+@pytest.fixture
+def recipes(user, another_user, tags, ingredients):
+    created = []
+    for number in range(10):
+        recipe = Recipe.objects.create(
+            author=another_user if number % 2 else user,
+            name=f'рецепт {number}',
+            text='описание',
+            cooking_time=5,
+            image=ContentFile(b'image', name='recipe.png'),
+        )
+        recipe.tags.set(tags[: 1 + number % 3])
+        ProductsInRecipe.objects.bulk_create(
+            ProductsInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients[: 2 + number % 4]
+        )
+        created.append(recipe)
+    return created
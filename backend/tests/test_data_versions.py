@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from django.core.cache import cache
+
+import pytest
+
+from api import mixins
+from recipes.models import DataVersion
+from recipes.versions import bump_version, get_version
+
+CHANGED = 1_000_000.5
+
+
+def test_bump_is_shared_through_database(db):
+    """Версия хранится в БД, а не в кеше процесса."""
+    assert get_version('tags') == 0
+    bump_version('tags')
+    bump_version('tags')
+    cache.clear()
+    assert get_version('tags') == 2
+
+
+def test_bump_invalidates_etag(anonymous_client, tags):
+    """Изменение из другого процесса сбрасывает ETag списка."""
+    response = anonymous_client.get('/api/tags/')
+    etag = response['ETag']
+    response = anonymous_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    bump_version('tags')
+    response = anonymous_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.parametrize(
+    'now, last_modified',
+    [(CHANGED + 0.4, None), (CHANGED + 1, 'Mon, 12 Jan 1970 13:46:40 GMT')],
+)
+def test_last_modified_only_for_past_seconds(
+    anonymous_client, tags, monkeypatch, now, last_modified
+):
+    """Изменение в текущую секунду не попадает в Last-Modified."""
+    DataVersion.objects.create(
+        name='tags',
+        version=1,
+        modified=datetime.fromtimestamp(CHANGED, timezone.utc),
+    )
+    monkeypatch.setattr(mixins, 'time', SimpleNamespace(time=lambda: now))
+    response = anonymous_client.get('/api/tags/')
+    assert response.get('Last-Modified') == last_modified
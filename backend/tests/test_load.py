@@ -0,0 +1,46 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+
+import pytest
+
+from recipes.models import Ingredient, Tag
+
+
+@pytest.fixture
+def reference_files(tmp_path):
+    ingredients = tmp_path / 'ingredients.csv'
+    ingredients.write_text(
+        'яблоко,г\nсахар,г\nсахар,г\nсахар,кг\n', encoding='UTF-8'
+    )
+    tags = tmp_path / 'tags.json'
+    tags.write_text(
+        json.dumps(
+            [
+                {'name': 'тег 0', 'color': '#FF0000', 'slug': 'new0'},
+                {'name': 'новый', 'color': '#000001', 'slug': 'new1'},
+                {'name': 'завтрак', 'color': '#00FF00', 'slug': 'breakfast'},
+            ]
+        ),
+        encoding='UTF-8',
+    )
+    return ['--ingredients', str(ingredients), '--tags', str(tags)]
+
+
+def load(arguments):
+    output = StringIO()
+    call_command('load', *arguments, stdout=output)
+    return output.getvalue()
+
+
+def test_load_skips_existing_rows(reference_files, ingredients, tags):
+    """Повторы пропускаются, теги - и по названию, и по цвету."""
+    output = load(reference_files)
+    assert 'ingredients: 1 new rows' in output
+    assert 'tags: 1 new rows' in output
+    assert Ingredient.objects.filter(name='сахар').count() == 2
+    assert Tag.objects.filter(slug='breakfast').exists()
+    output = load(reference_files)
+    assert 'ingredients: 0 new rows' in output
+    assert 'tags: 0 new rows' in output
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from recipes.models import Favorites, Recipe, ShoppingList
+
+CASES = 40
+
+
+def joined_recipe_ids(user, tags, authors, is_favorited, is_in_shopping_cart):
+    """Прежняя фильтрация через JOIN связанных таблиц."""
+    queryset = Recipe.objects.all()
+    if authors:
+        queryset = queryset.filter(author_id__in=authors)
+    if tags:
+        queryset = queryset.filter(tags__slug__in=tags).distinct()
+    if is_favorited:
+        queryset = queryset.filter(favorites__user=user)
+    if is_in_shopping_cart:
+        queryset = queryset.filter(shoppinglists__user=user)
+    return list(
+        queryset.order_by('-pub_date', '-id').values_list('id', flat=True)
+    )
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_filters_match_joins(
+    seed, user, another_user, user_client, recipes, tags
+):
+    """Фильтры без JOIN выбирают те же рецепты в том же порядке."""
+    generator = random.Random(seed)
+    for recipe in recipes:
+        for owner, model in (
+            (user, Favorites),
+            (user, ShoppingList),
+            (another_user, Favorites),
+            (another_user, ShoppingList),
+        ):
+            if generator.random() < 0.5:
+                model.objects.add_recipes(owner, [recipe.pk])
+    slugs = [tag.slug for tag in tags]
+    authors = [user.pk, another_user.pk]
+    for _ in range(CASES):
+        case = {
+            'tags': generator.sample(slugs, generator.randint(0, 3)),
+            'authors': generator.sample(authors, generator.randint(0, 2)),
+            'is_favorited': generator.random() < 0.4,
+            'is_in_shopping_cart': generator.random() < 0.4,
+        }
+        params = {
+            'limit': len(recipes),
+            'tags': case['tags'],
+            'author': case['authors'],
+        }
+        for flag in ('is_favorited', 'is_in_shopping_cart'):
+            if case[flag]:
+                params[flag] = 1
+        response = user_client.get('/api/recipes/', params)
+        assert response.status_code == 200, response.content
+        data = response.json()
+        expected = joined_recipe_ids(user, **case)
+        assert [recipe['id'] for recipe in data['results']] == expected, case
+        assert data['count'] == len(expected), case
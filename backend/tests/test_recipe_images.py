@@ -0,0 +1,71 @@
+import io
+import re
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from PIL import Image
+
+from recipes import images
+
+UPLOAD_URL = '/api/recipes/images/'
+
+
+def image_file(image_format, name):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue() + b'<script></script>')
+
+
+def test_upload_is_renamed_by_content(user_client):
+    """Сохраненный файл получает имя и расширение по формату."""
+    response = user_client.post(
+        UPLOAD_URL,
+        {'image': image_file('PNG', 'evil.html')},
+        format='multipart',
+    )
+    assert response.status_code == 201, response.content
+    image_url = response.json()['image']
+    assert re.search(r'/recipes/images/[0-9a-f]{32}\.png$', image_url)
+
+
+def test_upload_rejects_other_formats(user_client):
+    """Форматы вне списка разрешенных не принимаются."""
+    response = user_client.post(
+        UPLOAD_URL,
+        {'image': image_file('GIF', 'evil.html')},
+        format='multipart',
+    )
+    assert response.status_code == 400
+    assert 'image' in response.json()
+
+
+class BrokenPool:
+    _processes = None
+    shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool('worker died')
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+def test_broken_pool_is_recreated(user_client, monkeypatch):
+    """Сломанный пул дает 503 и заменяется при следующей загрузке."""
+    pool = BrokenPool()
+    monkeypatch.setattr(images, '_process_pool', pool)
+    response = user_client.post(
+        UPLOAD_URL,
+        {'image': image_file('PNG', 'photo.png')},
+        format='multipart',
+    )
+    assert response.status_code == 503
+    assert pool.shut_down
+    assert images._process_pool is None
+    response = user_client.post(
+        UPLOAD_URL,
+        {'image': image_file('PNG', 'photo.png')},
+        format='multipart',
+    )
+    assert response.status_code == 201, response.content
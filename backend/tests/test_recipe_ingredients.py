@@ -0,0 +1,115 @@
+import base64
+import io
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+from PIL import Image
+
+from recipes.models import ProductsInRecipe
+
+TABLE = ProductsInRecipe._meta.db_table
+
+
+def image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def payload(ingredients, tags, name='рецепт', amounts=None):
+    amounts = amounts or {}
+    return {
+        'ingredients': [
+            {'id': ingredient.pk, 'amount': amounts.get(ingredient.pk, 5)}
+            for ingredient in ingredients
+        ],
+        'tags': [tag.pk for tag in tags],
+        'image': image(),
+        'name': name,
+        'text': 'описание',
+        'cooking_time': 3,
+    }
+
+
+def writes(context, statement):
+    """Запросы statement к таблице ингредиентов рецептов."""
+    return [
+        query['sql']
+        for query in context.captured_queries
+        if query['sql'].startswith(statement) and TABLE in query['sql']
+    ]
+
+
+@pytest.fixture
+def recipe_id(user_client, ingredients, tags):
+    response = user_client.post(
+        '/api/recipes/', payload(ingredients[:4], tags), format='json'
+    )
+    assert response.status_code == 201, response.content
+    return response.json()['id']
+
+
+def test_create_inserts_ingredients_once(user_client, ingredients, tags):
+    """Ингредиенты нового рецепта записываются одним INSERT."""
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.post(
+            '/api/recipes/', payload(ingredients, tags), format='json'
+        )
+    assert response.status_code == 201, response.content
+    assert len(writes(context, 'INSERT')) == 1
+    assert ProductsInRecipe.objects.filter(
+        recipe_id=response.json()['id']
+    ).count() == len(ingredients)
+
+
+def test_rename_does_not_write_ingredients(
+    user_client, recipe_id, ingredients, tags
+):
+    """Изменение только названия не трогает ингредиенты."""
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.patch(
+            f'/api/recipes/{recipe_id}/',
+            payload(ingredients[:4], tags, name='новое название'),
+            format='json',
+        )
+    assert response.status_code == 200, response.content
+    for statement in ('INSERT', 'UPDATE', 'DELETE'):
+        assert not writes(context, statement), statement
+
+
+def test_partial_change_touches_changed_rows(
+    user_client, recipe_id, ingredients, tags
+):
+    """Меняются только удаленные, добавленные и измененные строки."""
+    before = dict(
+        ProductsInRecipe.objects.filter(recipe_id=recipe_id).values_list(
+            'ingredient_id', 'pk'
+        )
+    )
+    changed, removed, added = ingredients[1], ingredients[0], ingredients[4]
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.patch(
+            f'/api/recipes/{recipe_id}/',
+            payload(
+                [*ingredients[1:4], added], tags, amounts={changed.pk: 9}
+            ),
+            format='json',
+        )
+    assert response.status_code == 200, response.content
+    assert len(writes(context, 'DELETE')) == 1
+    assert len(writes(context, 'UPDATE')) == 1
+    assert len(writes(context, 'INSERT')) == 1
+    after = {
+        product.ingredient_id: product
+        for product in ProductsInRecipe.objects.filter(recipe_id=recipe_id)
+    }
+    assert removed.pk not in after
+    assert after[changed.pk].amount == 9
+    assert after[added.pk].amount == 5
+    for ingredient in ingredients[1:4]:
+        assert after[ingredient.pk].pk == before[ingredient.pk]
+    for ingredient in ingredients[2:4]:
+        assert after[ingredient.pk].amount == 5
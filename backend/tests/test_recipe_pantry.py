@@ -0,0 +1,43 @@
+import threading
+
+from api import indexes
+from recipes.versions import bump_version
+
+PANTRY_URL = '/api/recipes/pantry/'
+
+
+def test_pantry_ranks_recipes(anonymous_client, recipes, ingredients):
+    """Сначала рецепты, для которых есть все продукты."""
+    response = anonymous_client.get(
+        PANTRY_URL,
+        {'ingredients': [ingredient.pk for ingredient in ingredients[:2]]},
+    )
+    assert response.status_code == 200
+    first = response.json()['results'][0]
+    assert first['missing_count'] == 0
+    assert first['ingredients_count'] == 2
+
+
+def test_stale_index_is_served_during_rebuild(recipes, monkeypatch):
+    """После изменения рецептов индекс пересобирается в фоне."""
+    old = indexes.get_recipe_ingredient_index()
+    built = threading.Event()
+    release = threading.Event()
+
+    def build(version):
+        release.wait(5)
+        built.set()
+        return indexes.RecipeIngredientIndex([], [], [], version)
+
+    monkeypatch.setattr(indexes, 'build_recipe_ingredient_index', build)
+    bump_version('pantry')
+    assert indexes.get_recipe_ingredient_index() is old
+    rebuild = indexes._recipe_rebuild
+    assert indexes.get_recipe_ingredient_index() is old
+    assert indexes._recipe_rebuild is rebuild
+    release.set()
+    rebuild.join(5)
+    assert built.is_set()
+    new = indexes.get_recipe_ingredient_index()
+    assert new is not old
+    assert len(new) == 0
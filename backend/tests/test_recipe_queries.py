@@ -0,0 +1,48 @@
+import pytest
+
+from recipes.models import Favorites, ShoppingList, Subscription
+
+# Включая один запрос версий данных для ETag и кеша ответов.
+LIST_QUERIES = 5
+DETAIL_QUERIES = 4
+
+
+@pytest.mark.parametrize('client_name', ['anonymous_client', 'user_client'])
+def test_recipe_list_queries(
+    request, client_name, recipes, django_assert_num_queries
+):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+    client = request.getfixturevalue(client_name)
+    with django_assert_num_queries(LIST_QUERIES):
+        response = client.get('/api/recipes/', {'limit': 10})
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 10
+
+
+@pytest.mark.parametrize('client_name', ['anonymous_client', 'user_client'])
+def test_recipe_detail_queries(
+    request, client_name, recipes, django_assert_num_queries
+):
+    """Число запросов одного рецепта постоянно."""
+    client = request.getfixturevalue(client_name)
+    with django_assert_num_queries(DETAIL_QUERIES):
+        response = client.get(f'/api/recipes/{recipes[3].pk}/')
+    assert response.status_code == 200
+    assert len(response.json()['ingredients']) == 5
+
+
+def test_recipe_list_user_flags(
+    user, user_client, another_user, recipes, django_assert_num_queries
+):
+    """Отметки пользователя приходят в тех же запросах."""
+    Subscription.objects.create(user=user, author=another_user)
+    Favorites.objects.create(user=user, recipe=recipes[1])
+    ShoppingList.objects.create(user=user, recipe=recipes[2])
+    with django_assert_num_queries(LIST_QUERIES):
+        response = user_client.get('/api/recipes/', {'limit': 10})
+    results = {recipe['id']: recipe for recipe in response.json()['results']}
+    assert results[recipes[1].pk]['is_favorited'] is True
+    assert results[recipes[1].pk]['author']['is_subscribed'] is True
+    assert results[recipes[2].pk]['is_in_shopping_cart'] is True
+    assert results[recipes[0].pk]['is_favorited'] is False
+    assert results[recipes[0].pk]['author']['is_subscribed'] is False
@@ -0,0 +1,39 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from recipes.models import Favorites, Recipe, ShoppingList
+
+
+def update_scores():
+    output = StringIO()
+    call_command('update_recipe_scores', stdout=output)
+    return output.getvalue()
+
+
+def test_trending_prefers_recent_additions(user, another_user, recipes):
+    """Свежее добавление весит больше двух добавлений двухдневной давности."""
+    now = timezone.now()
+    old = [
+        Favorites.objects.create(user=user, recipe=recipes[0]),
+        ShoppingList.objects.create(user=another_user, recipe=recipes[0]),
+        Favorites.objects.create(user=another_user, recipe=recipes[0]),
+    ]
+    for addition in old:
+        type(addition).objects.filter(pk=addition.pk).update(
+            created=now - timedelta(days=2)
+        )
+    Favorites.objects.create(user=user, recipe=recipes[1])
+    update_scores()
+    scores = dict(Recipe.objects.values_list('pk', 'trending_score'))
+    assert scores[recipes[1].pk] > scores[recipes[0].pk] > 0
+    assert scores[recipes[2].pk] == 0
+
+
+def test_trending_is_stable_between_runs(user, recipes):
+    """Без новых добавлений повторный запуск ничего не меняет."""
+    Favorites.objects.create(user=user, recipe=recipes[0])
+    assert 'trending 1' in update_scores()
+    assert 'popular 0, trending 0' in update_scores()
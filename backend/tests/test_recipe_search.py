@@ -0,0 +1,43 @@
+from django.core.files.base import ContentFile
+
+import pytest
+
+from recipes.models import Recipe
+
+SEARCH_URL = '/api/recipes/'
+
+
+@pytest.fixture
+def search_recipes(user):
+    """Рецепты с тремя значениями релевантности, по пять на каждое."""
+    return Recipe.objects.bulk_create(
+        Recipe(
+            author=user,
+            name=f'борщ {number}',
+            text=' '.join(['борщ'] * (1 + number % 3)),
+            cooking_time=5,
+            image=ContentFile(b'image', name='recipe.png'),
+        )
+        for number in range(15)
+    )
+
+
+def test_search_cursor_over_tied_ranks(anonymous_client, search_recipes):
+    """Курсор проходит рецепты с равной релевантностью без повторов.
+
+    На PostgreSQL ts_rank возвращает real, и без приведения к double
+    precision значение из курсора не совпадало с рангом в БД.
+    """
+    response = anonymous_client.get(
+        SEARCH_URL, {'search': 'борщ', 'limit': 100}
+    )
+    expected = [recipe['id'] for recipe in response.json()['results']]
+    assert len(expected) == len(search_recipes)
+    seen = []
+    params = {'search': 'борщ', 'limit': 2, 'cursor': ''}
+    url = SEARCH_URL
+    while url:
+        data = anonymous_client.get(url, params).json()
+        seen.extend(recipe['id'] for recipe in data['results'])
+        url, params = data['next'], None
+    assert seen == expected
@@ -0,0 +1,27 @@
+import io
+
+import pytest
+from openpyxl import load_workbook
+
+from foodgram_backend import settings
+from recipes.models import ShoppingList
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.mark.parametrize('memory_size', [1, 1024 * 1024])
+def test_xlsx_is_streamed_from_temporary_file(
+    monkeypatch, user, user_client, recipes, memory_size
+):
+    """Файл xlsx отдается целиком и в памяти, и после сброса на диск."""
+    monkeypatch.setattr(
+        settings, 'SHOPPING_CART_XLSX_MEMORY_SIZE', memory_size
+    )
+    ShoppingList.objects.create(user=user, recipe=recipes[3])
+    response = user_client.get(DOWNLOAD_URL)
+    assert response.status_code == 200
+    content = b''.join(response.streaming_content)
+    assert int(response['Content-Length']) == len(content)
+    sheet = load_workbook(io.BytesIO(content)).active
+    rows = list(sheet.values)
+    assert len(rows) == 1 + len(recipes[3].ingredients.all())
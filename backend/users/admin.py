@@ -19,13 +19,18 @@ class UserAdmin(BaseAdmin):
         'first_name',
         'last_name',
         'password',
+        'recipes_count',
+        'subscribers_count',
     )
+    readonly_fields = ('recipes_count', 'subscribers_count')
     fields = (
         'username',
         'email',
         'first_name',
         'last_name',
         'password',
+        'recipes_count',
+        'subscribers_count',
     )
     list_filter = ('username', 'email')
     search_fields = ('username__startswith',)
@@ -2,11 +2,14 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 from foodgram_backend import settings
+from recipes.counters import DerivedFieldsMixin
 
 
-class User(AbstractUser):
+class User(DerivedFieldsMixin, AbstractUser):
     """Модель для работы с пользователями."""
 
+    derived_fields = ('recipes_count', 'subscribers_count')
+
     username = models.CharField(
         'уникальный юзернейм',
         max_length=150,
@@ -20,6 +23,16 @@ class User(AbstractUser):
     first_name = models.CharField('имя', max_length=150)
     last_name = models.CharField('фамилия', max_length=150)
     password = models.CharField(max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        'количество рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'количество подписчиков',
+        default=0,
+        editable=False,
+    )
     REQUIRED_FIELDS = ('email', 'first_name', 'last_name')
 
     class Meta:
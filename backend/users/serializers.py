@@ -2,7 +2,8 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.utils import check_subscribed
+from api.fields import ImageVariantsField
+from api.utils import check_subscribed, get_recipes_limit
 from foodgram_backend import settings
 from recipes.models import Recipe, Subscription
 from users.models import User
@@ -51,6 +52,8 @@ class CustomUserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверка подписки пользователя на автора рецепта."""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return check_subscribed(
             self.context.get('request'),
             Subscription,
@@ -61,11 +64,14 @@ class CustomUserSerializer(UserSerializer):
 class SubscriptionsRecipesSerializer(serializers.ModelSerializer):
     """Сериалайзер для рецепта в подписках."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'image',
+            'image_variants',
             'name',
             'cooking_time',
         )
@@ -98,25 +104,18 @@ class SubscriptionsSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверка подписки пользователя на автора рецепта."""
-        return check_subscribed(
-            self.context.get('request'),
-            Subscription,
-            obj,
-        )
+        return obj.user_id == self.context.get('request').user.pk
 
     def get_recipes_count(self, obj):
         """Получение количество рецептов автора."""
-        return Recipe.objects.filter(author__username=obj).count()
+        return obj.author.recipes_count
 
     def get_recipes(self, obj):
-        """Получение рецептов автора."""
-        recipes_limit = self.context.get('request').GET.get('recipes_limit')
-        if recipes_limit is None:
-            return SubscriptionsRecipesSerializer(
-                Recipe.objects.filter(author=obj.author),
-                many=True,
-            ).data
-        return SubscriptionsRecipesSerializer(
-            Recipe.objects.filter(author=obj.author)[: int(recipes_limit)],
-            many=True,
-        ).data
+        """Получение последних рецептов автора."""
+        if hasattr(obj.author, 'recent_recipes'):
+            recipes = obj.author.recent_recipes
+        else:
+            recipes = obj.author.recipes.all()[
+                : get_recipes_limit(self.context.get('request'))
+            ]
+        return SubscriptionsRecipesSerializer(recipes, many=True).data
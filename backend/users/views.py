@@ -1,3 +1,4 @@
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 
 from djoser.views import UserViewSet
@@ -6,7 +7,8 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.models import Subscription
+from api.utils import get_recipes_limit
+from recipes.models import Recipe, Subscription
 from users.models import User
 from users.serializers import SubscriptionsSerializer
 
@@ -29,6 +31,19 @@ class UserRegistrationViewSet(UserViewSet):
             Subscription.objects.filter(
                 user=request.user,
             )
+            .select_related('author')
+            .order_by('-id')
+        )
+        prefetch_related_objects(
+            authors,
+            Prefetch(
+                'author__recipes',
+                queryset=Recipe.objects.latest_for_authors(
+                    [subscription.author_id for subscription in authors],
+                    get_recipes_limit(request),
+                ),
+                to_attr='recent_recipes',
+            ),
         )
         serializer = SubscriptionsSerializer(
             authors,